@@ -1,53 +1,80 @@
 """
 Chart creation functions using Altair.
+
+Charts accept a DataFrame or a PostSelection and read their tables from the
+selection's AggregateBundle, which is computed in a single pass (over the cube
+cells when the selection has a cube view) and shared by every chart.
+Builders are wrapped in memoize_chart: for a selection from select_posts they
+return the cached Vega-Lite spec of the same view and parameters (render with
+modules.chart_specs.render_chart), and only build an Altair chart on a miss.
 """
 from typing import Optional
 import pandas as pd
 import altair as alt
 import streamlit as st
+from modules.chart_specs import memoize_chart
+from modules.downsampling import CHART_MAX_POINTS, downsample, downsample_note
+from modules.social.aggregates import choose_granularity, get_aggregates
+from modules.social.geography import country_breakdown
 
 
-def create_timeseries_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
+@memoize_chart
+def create_timeseries_chart(df: pd.DataFrame,
+                            granularity: str = "auto",
+                            max_points: Optional[int] = CHART_MAX_POINTS) -> Optional[alt.Chart]:
     """
     Create time series chart showing engagement over time.
     
     Args:
-        df: DataFrame with post_date and engagement_total columns
+        df: DataFrame or PostSelection with post_day and engagement_total columns
+        granularity: "day", "week", "month", or "auto" to pick the finest one
+            that keeps the chart within TIMESERIES_MAX_POINTS points
+        max_points: Point budget; longer series are LTTB-downsampled and the
+            chart subtitle reports how many points were dropped
         
     Returns:
         Altair chart or None if insufficient data
     """
-    if "post_date" not in df.columns:
+    if "post_day" not in df.columns:
         return None
         
-    ts = (
-        df.dropna(subset=["post_date"]).copy()
-        .assign(post_day=lambda d: d["post_date"].dt.date)
-        .groupby("post_day", as_index=False)["engagement_total"].sum()
-    )
+    aggregates = get_aggregates(df)
+    daily = aggregates.by("post_day")
     
-    if ts.empty:
+    if daily.empty:
         return None
         
+    if granularity == "auto":
+        granularity = choose_granularity(daily["post_day"].iloc[0], daily["post_day"].iloc[-1])
+    ts = (
+        aggregates.timeseries(granularity)[["post_day", "engagement"]]
+        .rename(columns={"engagement": "engagement_total"})
+    )
+    ts, dropped = downsample(ts, "post_day", "engagement_total", max_points)
+        
+    period_title = {"day": "Ngày", "week": "Tuần", "month": "Tháng"}[granularity]
     chart = (
         alt.Chart(ts)
         .mark_line(point=True)
         .encode(
-            x=alt.X("post_day:T", title="Ngày"),
+            x=alt.X("post_day:T", title=period_title),
             y=alt.Y("engagement_total:Q", title="Tổng engagement"),
-            tooltip=["post_day:T", "engagement_total:Q"],
+            tooltip=[alt.Tooltip("post_day:T", title=period_title), "engagement_total:Q"],
         )
         .properties(height=300)
     )
+    if dropped:
+        chart = chart.properties(title=alt.TitleParams("", subtitle=downsample_note(len(ts), dropped)))
     return chart
 
 
+@memoize_chart
 def create_platform_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
     """
     Create platform performance chart.
     
     Args:
-        df: DataFrame with platform and engagement metrics
+        df: DataFrame or PostSelection with platform and engagement metrics
         
     Returns:
         Altair chart or None if insufficient data
@@ -56,10 +83,10 @@ def create_platform_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
         return None
         
     plat = (
-        df.groupby("platform", as_index=False)
-        .agg(engagement_rate=("engagement_rate", "mean"), posts=("post_id", "count"))
-        .sort_values("engagement_rate", ascending=False)
+        get_aggregates(df).by("platform")[["platform", "er", "posts"]]
+        .rename(columns={"er": "engagement_rate"})
     )
+    plat = plat.sort_values("engagement_rate", ascending=False)
     
     if plat.empty:
         return None
@@ -82,12 +109,52 @@ def create_platform_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
     return chart
 
 
+@memoize_chart
+def create_country_chart(df: pd.DataFrame, top: int = 15) -> Optional[alt.Chart]:
+    """
+    Create chart of posts and engagement rate by creator country.
+    
+    Args:
+        df: DataFrame or PostSelection with user_country and engagement metrics
+        top: Number of countries to show, by post count
+        
+    Returns:
+        Altair chart or None if insufficient data
+    """
+    if "user_country" not in df.columns:
+        return None
+        
+    geo = country_breakdown(df).head(top)
+    
+    if geo.empty:
+        return None
+        
+    chart = (
+        alt.Chart(geo)
+        .mark_bar()
+        .encode(
+            x=alt.X("posts:Q", title="Số bài"),
+            y=alt.Y("country:N", title="Quốc gia", sort="-x"),
+            color=alt.Color("er:Q", title="ER TB", scale=alt.Scale(scheme="blues"), legend=alt.Legend(format="%")),
+            tooltip=[
+                alt.Tooltip("country:N", title="Quốc gia"),
+                alt.Tooltip("posts:Q", title="Số bài"),
+                alt.Tooltip("engagement:Q", title="Tổng engagement", format=","),
+                alt.Tooltip("er:Q", title="ER TB", format=".2%"),
+            ],
+        )
+        .properties(height=max(200, 24 * len(geo)))
+    )
+    return chart
+
+
+@memoize_chart
 def create_sentiment_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
     """
     Create sentiment distribution chart.
     
     Args:
-        df: DataFrame with post_sentiment column
+        df: DataFrame or PostSelection with post_sentiment column
         
     Returns:
         Altair chart or None if insufficient data
@@ -95,8 +162,11 @@ def create_sentiment_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
     if "post_sentiment" not in df.columns:
         return None
         
-    sent = df["post_sentiment"].value_counts().reset_index()
-    sent.columns = ["post_sentiment", "count"]
+    sent = (
+        get_aggregates(df).by("post_sentiment")[["post_sentiment", "posts"]]
+        .rename(columns={"posts": "count"})
+        .sort_values("count", ascending=False, kind="stable")
+    )
     
     if sent.empty:
         return None
@@ -115,12 +185,13 @@ def create_sentiment_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
     return chart
 
 
+@memoize_chart
 def create_hashtag_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
     """
     Create top hashtags chart.
     
     Args:
-        df: DataFrame with hashtag and engagement metrics
+        df: DataFrame or PostSelection with hashtag and engagement metrics
         
     Returns:
         Altair chart or None if insufficient data
@@ -129,8 +200,7 @@ def create_hashtag_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
         return None
         
     top = (
-        df.groupby("hashtag", as_index=False)
-        .agg(posts=("post_id", "count"), er=("engagement_rate", "mean"))
+        get_aggregates(df).by("hashtag")[["hashtag", "posts", "er"]]
         .sort_values(["posts", "er"], ascending=[False, False])
         .head(15)
     )
@@ -156,12 +226,13 @@ def create_hashtag_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
     return chart
 
 
+@memoize_chart
 def create_topic_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
     """
     Create climate topics chart.
     
     Args:
-        df: DataFrame with climate_topic column
+        df: DataFrame or PostSelection with climate_topic column
         
     Returns:
         Altair chart or None if insufficient data
@@ -170,8 +241,7 @@ def create_topic_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
         return None
         
     topic = (
-        df.groupby("climate_topic", as_index=False)
-        .agg(posts=("post_id", "count"), er=("engagement_rate", "mean"))
+        get_aggregates(df).by("climate_topic")[["climate_topic", "posts", "er"]]
         .sort_values(["posts", "er"], ascending=[False, False])
         .head(20)
     )
@@ -197,37 +267,26 @@ def create_topic_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
     return chart
 
 
+@memoize_chart
 def create_time_heatmap(df: pd.DataFrame, platform_focus: Optional[str] = None) -> Optional[alt.Chart]:
     """
     Create time heatmap showing engagement by day of week and hour.
     
     Args:
-        df: DataFrame with post_date and engagement metrics
+        df: DataFrame or PostSelection with post_day, post_hour and engagement metrics
         platform_focus: Optional platform to focus on
         
     Returns:
         Altair chart or None if insufficient data
     """
-    if "post_date" not in df.columns:
+    if "post_hour" not in df.columns:
         return None
         
-    data = df.copy()
-    if platform_focus and "platform" in data.columns:
-        data = data[data["platform"] == platform_focus]
-        
-    data = data.dropna(subset=["post_date"]).assign(
-        dow=lambda d: d["post_date"].dt.day_name(),
-        hod=lambda d: d["post_date"].dt.hour,
-    )
+    heat = get_aggregates(df).heatmap(platform_focus if "platform" in df.columns else None)
     
-    if data.empty:
+    if heat.empty:
         return None
         
-    heat = (
-        data.groupby(["dow", "hod"], as_index=False)
-        .agg(er=("engagement_rate", "mean"), n=("post_id", "count"))
-    )
-    
     # Day order
     dow_order = [
         "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"
@@ -252,30 +311,23 @@ def create_time_heatmap(df: pd.DataFrame, platform_focus: Optional[str] = None)
     return chart
 
 
+@memoize_chart
 def create_cta_chart(df: pd.DataFrame) -> Optional[alt.Chart]:
     """
     Create Call-to-Action performance chart.
     
     Args:
-        df: DataFrame with CTA and engagement metrics
+        df: DataFrame or PostSelection with CTA and engagement metrics
         
     Returns:
         Altair chart or None if insufficient data
     """
-    required_cols = {"engagement_shares", "engagement_comments", "call_to_action"}
-    if not required_cols.issubset(df.columns):
+    # The shares + comments proxy is summed by the aggregation pass
+    if "call_to_action" not in df.columns:
         return None
         
-    tmp = df.copy()
-    tmp["interaction_proxy"] = tmp["engagement_shares"].fillna(0) + tmp["engagement_comments"].fillna(0)
-    
     cta = (
-        tmp.groupby("call_to_action", as_index=False)
-        .agg(
-            posts=("post_id", "count"), 
-            er=("engagement_rate", "mean"), 
-            proxy=("interaction_proxy", "mean")
-        )
+        get_aggregates(df).by("call_to_action")[["call_to_action", "posts", "er", "proxy"]]
         .sort_values(["posts", "proxy", "er"], ascending=[False, False, False])
         .head(20)
     )
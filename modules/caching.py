@@ -0,0 +1,325 @@
+"""
+Process-wide caches shared by the portfolio pages.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# Frame attribute carrying the version token of a loaded dataset or filter result
+VERSION_TOKEN_ATTR = "dataset_version"
+
+# Frames stamped by stamp_version, by id: a token is honoured only on the object it was stamped on
+_STAMPED = weakref.WeakValueDictionary()
+
+
+def derive_token(parent: str, spec: Any) -> str:
+    """
+    Version token of a result computed from a versioned input.
+
+    Args:
+        parent: Token of the input
+        spec: JSON-serializable description of the computation (filter spec, parameters)
+
+    Returns:
+        Token naming the input version and the spec
+    """
+    digest = hashlib.blake2b(json.dumps(spec, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+    return f"{parent}/{digest}"
+
+
+def stamp_version(df: pd.DataFrame, token: Optional[str]) -> pd.DataFrame:
+    """Tag a loaded or filtered frame with its version token (None removes an inherited one); returns the frame."""
+    if token is None:
+        df.attrs.pop(VERSION_TOKEN_ATTR, None)
+        if _STAMPED.get(id(df)) is df:
+            del _STAMPED[id(df)]
+    else:
+        df.attrs[VERSION_TOKEN_ATTR] = token
+        _STAMPED[id(df)] = df
+    return df
+
+
+def is_stamped(df: pd.DataFrame) -> bool:
+    """Whether df is the very object stamp_version tagged, rather than a copy inheriting its attrs."""
+    return df.attrs.get(VERSION_TOKEN_ATTR) is not None and _STAMPED.get(id(df)) is df
+
+
+def version_token(data: Any) -> Optional[str]:
+    """
+    Cheap immutable identifier of a dataset's contents, for cache keys instead of hashing the data.
+
+    A frame reports a token only if it is the object stamp_version tagged:
+    pandas copies ``attrs`` into frames copied, sorted, filtered or edited
+    from it, and those must not share its cache entries. Other objects (PostSelection) report their ``version_token`` attribute.
+
+    Args:
+        data: DataFrame or row selection
+
+    Returns:
+        Token string, or None when the data is unversioned and must not be cached
+    """
+    if not isinstance(data, pd.DataFrame):
+        return getattr(data, "version_token", None)
+    if not is_stamped(data):
+        return None
+    return data.attrs[VERSION_TOKEN_ATTR]
+
+
+def estimate_nbytes(value: Any) -> int:
+    """Approximate memory held by a cached value."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray) or isinstance(getattr(value, "nbytes", None), int):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+def _column_buffer(series: pd.Series) -> Optional[np.ndarray]:
+    """The ndarray holding a column's values, where pandas exposes it without a copy."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.array.codes
+    else:
+        values = series.to_numpy()
+    # Copy-on-Write hands out read-only views; the buffer is the view's base
+    buffer = values.base if values.base is not None else values
+    if not isinstance(buffer, np.ndarray) or buffer.dtype == object:
+        return None
+    return buffer
+
+
+def freeze_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make a frame's value buffers read-only so writes into it raise.
+
+    Covers numeric, datetime and categorical columns; Arrow-backed columns
+    are immutable already. Structural changes (added, dropped or replaced
+    columns) are caught by comparing ``frame_signature`` instead.
+
+    Args:
+        df: Frame about to be shared
+
+    Returns:
+        The same frame
+    """
+    for col in df.columns:
+        buffer = _column_buffer(df[col])
+        if buffer is not None:
+            buffer.flags.writeable = False
+    return df
+
+
+def frame_signature(df: pd.DataFrame) -> tuple:
+    """Cheap structural fingerprint: shape, columns, dtypes and the identity of each value buffer."""
+    buffers = []
+    for col in df.columns:
+        buffer = _column_buffer(df[col])
+        buffers.append(None if buffer is None else id(buffer))
+    return (df.shape, tuple(df.columns), tuple(str(dtype) for dtype in df.dtypes), tuple(buffers))
+
+
+class SharedDatasetMutated(RuntimeError):
+    """A dataset held by the registry was modified in place by one of its users."""
+
+
+class BoundedLRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by the bytes of its values.
+
+    Shared by every Streamlit session in the process. Entries are evicted
+    oldest-first once the total estimated size exceeds ``max_bytes``; a value
+    larger than the whole budget is returned but not stored.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = estimate_nbytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+
+    def _peek(self, key: Hashable) -> Optional[Any]:
+        """Cached value for key without touching recency or counters (caller holds the lock)."""
+        entry = self._entries.get(key)
+        return None if entry is None else entry[0]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key (marking it recently used), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting least-recently-used entries to stay within budget."""
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def discard(self, key: Hashable) -> None:
+        """Drop one entry if present."""
+        with self._lock:
+            removed = self._entries.pop(key, None)
+            if removed is not None:
+                self.nbytes -= removed[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        """Counters for monitoring cache effectiveness."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class DatasetRegistry(BoundedLRUCache):
+    """
+    Process-wide owner of the loaded datasets of every page.
+
+    Every session receives the same object, so DataFrames are frozen with
+    ``freeze_frame`` when registered and their ``frame_signature`` is checked
+    on every hit: users must copy before modifying. A mutated dataset is
+    dropped and SharedDatasetMutated raised, so the next request reloads it.
+
+    Each dataset is held once, under a key naming it (e.g. ``("social", path)``)
+    and a stamp describing the source state it was loaded from (e.g. size and
+    mtime). A changed stamp replaces the entry rather than adding a second
+    copy. Concurrent sessions asking for the same missing dataset wait for a
+    single load. Least-recently-used datasets are evicted once their total
+    size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = estimate_nbytes):
+        super().__init__(max_bytes, sizeof=lambda entry: sizeof(entry[1]))
+        self.loads = 0
+        self._loading = {}
+
+    def _current(self, key: Hashable, stamp: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._peek(key)
+        return entry[1] if entry is not None and entry[0] == stamp else None
+
+    def _checked(self, key: Hashable, entry: tuple) -> Any:
+        """Return the dataset of an entry after verifying it was not mutated."""
+        _, dataset, signature = entry
+        if signature is not None and frame_signature(dataset) != signature:
+            self.discard(key)
+            raise SharedDatasetMutated(
+                f"Shared dataset {key!r} was modified in place; copy it before changing it"
+            )
+        return dataset
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any], stamp: Hashable = None) -> Any:
+        """
+        Return the dataset registered under key for this stamp, loading it on a miss.
+
+        Args:
+            key: Dataset name
+            load: Function loading the dataset
+            stamp: Source state the dataset must have been loaded from
+
+        Returns:
+            The shared dataset object
+        """
+        entry = self.get(key)
+        if entry is not None and entry[0] == stamp:
+            return self._checked(key, entry)
+        if entry is not None:
+            # Stale version: counted as a hit by get(), but it needs a load
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another session may have finished the same load while this one waited
+            dataset = self._current(key, stamp)
+            if dataset is None:
+                dataset = load()
+                signature = None
+                if isinstance(dataset, pd.DataFrame):
+                    signature = frame_signature(freeze_frame(dataset))
+                with self._lock:
+                    self.loads += 1
+                self.put(key, (stamp, dataset, signature))
+        with self._lock:
+            # A waiter that arrived after the pop may already have installed its own lock
+            if self._loading.get(key) is key_lock:
+                del self._loading[key]
+        return dataset
+
+    def stats(self) -> dict:
+        with self._lock:
+            loads = self.loads
+        return {**super().stats(), "loads": loads}
+
+
+def cache_stats(caches: dict) -> pd.DataFrame:
+    """
+    Counters of several caches as one table, for operators.
+
+    Args:
+        caches: Display name -> BoundedLRUCache (or DatasetRegistry)
+
+    Returns:
+        One row per cache with its ``stats()`` and the hit rate
+    """
+    table = pd.DataFrame.from_dict({name: cache.stats() for name, cache in caches.items()}, orient="index")
+    lookups = table["hits"] + table["misses"]
+    table["hit_rate"] = (table["hits"] / lookups.where(lookups > 0)).round(3)
+    table["mb"] = (table.pop("bytes") / 2**20).round(1)
+    table["max_mb"] = (table.pop("max_bytes") / 2**20).round(1)
+    return table
+
+
+# Every loaded dataset of the process (social posts, uploads, taxi trips)
+DATASETS = DatasetRegistry(max_bytes=int(os.environ.get("DATASET_REGISTRY_MAX_BYTES", 1024 * 1024 * 1024)))
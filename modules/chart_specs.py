@@ -0,0 +1,98 @@
+"""
+Memoized Vega-Lite specs of the portfolio's Altair charts.
+"""
+import functools
+import hashlib
+import os
+import threading
+from contextlib import nullcontext
+from typing import Any, Callable
+
+import altair as alt
+import streamlit as st
+from streamlit.dataframe_util import convert_anything_to_arrow_bytes
+
+from modules.caching import BoundedLRUCache, version_token
+
+# Finished specs with their data as Arrow bytes, shared by every session
+CHART_CACHE = BoundedLRUCache(max_bytes=int(os.environ.get("CHART_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+
+# Altair's theme and data transformer registries are process-global
+_ALTAIR_LOCK = threading.Lock()
+
+# Altair 5.5 moved the theme registry to alt.theme; older 5.x releases only have alt.themes
+_THEMES = alt.theme if hasattr(getattr(alt, "theme", None), "active") else alt.themes
+
+
+def _to_arrow_dataset(data: Any, datasets: dict) -> dict:
+    """Altair data transformer storing each chart's data as Arrow bytes under a content hash."""
+    payload = convert_anything_to_arrow_bytes(data)
+    name = hashlib.blake2b(payload, digest_size=16).hexdigest()
+    datasets[name] = payload
+    return {"name": name}
+
+
+alt.data_transformers.register("arrow_dataset", _to_arrow_dataset)
+
+
+def chart_spec(chart: alt.TopLevelMixin) -> dict:
+    """
+    Validate and serialize an Altair chart once, into the spec Streamlit renders.
+
+    Swaps the default theme for the empty one as Streamlit does and moves the chart
+    data into named Arrow datasets, so ``st.vega_lite_chart`` ships the spec as is.
+
+    Args:
+        chart: Altair chart
+
+    Returns:
+        Vega-Lite spec dict with a ``datasets`` entry of Arrow bytes
+    """
+    datasets = {}
+    with _ALTAIR_LOCK:
+        theme = _THEMES.enable("none") if _THEMES.active == "default" else nullcontext()
+        with theme, alt.data_transformers.enable("arrow_dataset", datasets=datasets):
+            spec = chart.to_dict()
+    spec["datasets"] = {**spec.get("datasets", {}), **datasets}
+    return spec
+
+
+def memoize_chart(build: Callable) -> Callable:
+    """
+    Serve a chart builder's spec from CHART_CACHE while its input is unchanged.
+
+    The cache key is the builder, the version token of its first argument
+    (see modules.caching.version_token) and the remaining arguments, so the
+    data itself is never hashed. On a hit neither the aggregation nor Altair's
+    validation and serialization run. Inputs without a token are built every
+    time and returned as Altair charts.
+
+    Args:
+        build: Function taking the data first and returning an Altair chart or None
+
+    Returns:
+        Wrapped builder returning a spec dict (or None) for keyed inputs
+    """
+    @functools.wraps(build)
+    def wrapper(df, *args, **kwargs):
+        token = version_token(df)
+        if token is None:
+            return build(df, *args, **kwargs)
+        key = (build.__module__, build.__qualname__, token, args, tuple(sorted(kwargs.items())))
+        spec = CHART_CACHE.get(key)
+        if spec is None:
+            chart = build(df, *args, **kwargs)
+            if chart is None:
+                return None
+            spec = chart_spec(chart)
+            CHART_CACHE.put(key, spec)
+        return spec
+
+    return wrapper
+
+
+def render_chart(chart, **kwargs):
+    """Show a chart from a memoized builder: spec dicts go to st.vega_lite_chart, Altair charts to st.altair_chart."""
+    if isinstance(chart, dict):
+        return st.vega_lite_chart(chart, **kwargs)
+    return st.altair_chart(chart, **kwargs)
@@ -0,0 +1,91 @@
+"""
+Largest-Triangle-Three-Buckets downsampling of line-chart series.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Points a line chart sends to the browser at most
+CHART_MAX_POINTS = 1000
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Positions of the points Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept. The points between are split
+    into n_out - 2 equal buckets, and each bucket keeps the point forming the
+    largest triangle with the point kept before it and the mean of the next
+    bucket, which preserves peaks and troughs. Bucket means come from one
+    cumulative sum and each bucket's areas from one vectorized expression.
+
+    Args:
+        x: Sorted numeric x values
+        y: Numeric y values
+        n_out: Number of points to keep
+
+    Returns:
+        Sorted positions of the kept points (every position if n_out >= len(x))
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = np.maximum(edges[1:] - edges[:-1], 1)
+    mean_x = (sum_x[edges[1:]] - sum_x[edges[:-1]]) / sizes
+    mean_y = (sum_y[edges[1:]] - sum_y[edges[:-1]]) / sizes
+    # The bucket after the last one is the final point
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    anchor = 0
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        area = np.abs(
+            (x[anchor] - next_x[bucket]) * (y[lo:hi] - y[anchor])
+            - (x[anchor] - x[lo:hi]) * (next_y[bucket] - y[anchor])
+        )
+        anchor = lo + int(np.argmax(area))
+        kept[bucket + 1] = anchor
+    return kept
+
+
+def downsample(frame: pd.DataFrame,
+               x: str,
+               y: str,
+               max_points: Optional[int] = CHART_MAX_POINTS) -> Tuple[pd.DataFrame, int]:
+    """
+    Reduce a series sorted by x to at most max_points rows with LTTB.
+
+    Args:
+        frame: Series to plot, sorted by x
+        x: Column with the x values (numeric, datetime or date objects)
+        y: Column with the y values
+        max_points: Point budget; None keeps every row
+
+    Returns:
+        Tuple of (kept rows, number of rows dropped)
+    """
+    if max_points is None or len(frame) <= max_points:
+        return frame, 0
+    x_values = frame[x]
+    if x_values.dtype == object:
+        # Python date/datetime objects (e.g. from Series.dt.date) become timestamps
+        x_values = pd.to_datetime(x_values)
+    if pd.api.types.is_datetime64_any_dtype(x_values):
+        x_values = x_values.astype("int64")
+    kept = lttb_indices(x_values.to_numpy(dtype=np.float64), frame[y].to_numpy(dtype=np.float64), max_points)
+    return frame.iloc[kept].reset_index(drop=True), len(frame) - len(kept)
+
+
+def downsample_note(shown: int, dropped: int) -> str:
+    """Subtitle reporting how many points downsampling hid."""
+    return f"{shown:,} of {shown + dropped:,} points shown (LTTB downsampled, peaks kept)"
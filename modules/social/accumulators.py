@@ -0,0 +1,131 @@
+"""
+Mergeable accumulators for the KPI cards.
+"""
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.caching import is_stamped
+
+# Frame attribute carrying the accumulator of the whole loaded frame (as a dict)
+KPI_ATTR = "kpi_accumulator"
+
+
+class KPIAccumulator:
+    """
+    Count, sum and sum of squares of engagement rate and total engagement.
+
+    Accumulators can be updated chunk by chunk while a CSV streams in and
+    merged across partitions (cube cells, snapshot parts) or worker processes
+    (they pickle, and ``to_dict`` is JSON-safe), so KPIs never need the rows
+    once the partitions have been summarized.
+    """
+
+    FIELDS = (
+        "posts",
+        "er_count", "er_sum", "er_sumsq",
+        "engagement_count", "engagement_sum", "engagement_sumsq",
+    )
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, values.get(field, 0))
+
+    def update(self, chunk: pd.DataFrame) -> "KPIAccumulator":
+        """Add the posts of a chunk (DataFrame or PostSelection); returns self."""
+        self.posts += len(chunk)
+        for prefix, col in (("er", "engagement_rate"), ("engagement", "engagement_total")):
+            if col not in chunk.columns:
+                continue
+            values = chunk[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            setattr(self, f"{prefix}_count", getattr(self, f"{prefix}_count") + len(values))
+            setattr(self, f"{prefix}_sum", getattr(self, f"{prefix}_sum") + float(values.sum()))
+            setattr(self, f"{prefix}_sumsq", getattr(self, f"{prefix}_sumsq") + float(np.dot(values, values)))
+        return self
+
+    def merge(self, other: "KPIAccumulator") -> "KPIAccumulator":
+        """Add another accumulator's posts; returns self."""
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        return self
+
+    @classmethod
+    def combine(cls, accumulators: Iterable["KPIAccumulator"]) -> "KPIAccumulator":
+        """Merge any number of accumulators into a new one."""
+        total = cls()
+        for accumulator in accumulators:
+            total.merge(accumulator)
+        return total
+
+    @classmethod
+    def from_totals(cls, totals: dict) -> "KPIAccumulator":
+        """Accumulator from summed cube measures (see modules.social.cube.CUBE_MEASURES)."""
+        return cls(
+            posts=totals["posts"],
+            er_count=totals["er_count"],
+            er_sum=totals["er_sum"],
+            er_sumsq=totals["er_sumsq"],
+            engagement_count=totals["posts"],
+            engagement_sum=totals["engagement"],
+            engagement_sumsq=totals["engagement_sumsq"],
+        )
+
+    def to_dict(self) -> dict:
+        return {field: float(getattr(self, field)) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "KPIAccumulator":
+        return cls(**{field: values[field] for field in cls.FIELDS})
+
+    @staticmethod
+    def _mean(count, total) -> float:
+        return float(total / count) if count else float("nan")
+
+    @staticmethod
+    def _std(count, total, sumsq) -> float:
+        """Sample standard deviation (ddof=1, like pandas)."""
+        if count < 2:
+            return float("nan")
+        return float(np.sqrt(max(sumsq - total * total / count, 0.0) / (count - 1)))
+
+    @property
+    def mean_rate(self) -> float:
+        return self._mean(self.er_count, self.er_sum)
+
+    @property
+    def std_rate(self) -> float:
+        return self._std(self.er_count, self.er_sum, self.er_sumsq)
+
+    @property
+    def mean_engagement(self) -> float:
+        return self._mean(self.engagement_count, self.engagement_sum)
+
+    @property
+    def std_engagement(self) -> float:
+        return self._std(self.engagement_count, self.engagement_sum, self.engagement_sumsq)
+
+    def kpis(self) -> dict:
+        """The KPI dictionary of utils.calculate_kpis."""
+        return {
+            "total_posts": int(self.posts),
+            "avg_engagement_rate": self.mean_rate,
+            "total_engagement": int(round(self.engagement_sum)),
+        }
+
+
+def frame_accumulator(df: pd.DataFrame) -> Optional[KPIAccumulator]:
+    """
+    Accumulator recorded at ingest for a loaded frame.
+
+    None for any other frame, including copies of it: attrs survive copying,
+    filtering and editing, so only the stamped object itself is trusted (see
+    modules.caching.is_stamped).
+    """
+    if not is_stamped(df):
+        return None
+    values = df.attrs.get(KPI_ATTR)
+    if values is None or values["posts"] != len(df):
+        return None
+    return KPIAccumulator.from_dict(values)
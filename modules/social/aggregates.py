@@ -0,0 +1,245 @@
+"""
+Single-pass aggregation of a post selection into everything the social page renders.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.social.cube import CUBE_MEASURES, cell_measures, get_dimension_codes
+from modules.social.selection import PostSelection
+from modules.social.storage import DAY_NAMES
+
+# Dimensions with their own per-value table
+TABLE_DIMENSIONS = ("post_day", "platform", "post_sentiment", "hashtag", "climate_topic", "call_to_action")
+
+# Time series resolutions, finest first
+TIME_GRANULARITIES = ("day", "week", "month")
+
+# The automatic resolution is the finest one that keeps the series within this many points
+TIMESERIES_MAX_POINTS = 400
+
+class AggregateBundle:
+    """
+    Per-dimension tables, the weekday x hour grid and the totals of one selection.
+
+    Every table carries the additive measures of CUBE_MEASURES plus ``er`` (mean engagement rate) and
+    ``proxy`` (mean shares + comments per post). Rows are in label order and
+    only values with at least one post are kept, like an observed groupby.
+
+    ``approximate`` maps each dimension whose table came from a sketch to its
+    error bounds (see modules.social.sketches); it is empty for exact bundles.
+    """
+
+    def __init__(self, tables: dict, heat: Optional[np.ndarray], heat_platforms: pd.Index, totals: dict):
+        self.tables = tables
+        # Measures x (platforms + unknown) x weekday x hour
+        self.heat = heat
+        self.heat_platforms = heat_platforms
+        self.totals = totals
+        self.approximate = {}
+        # Week and month rollups of the post_day table, built on first use
+        self._rollups = {}
+
+    @property
+    def nbytes(self) -> int:
+        total = sum(int(table.memory_usage(deep=True).sum()) for table in self.tables.values())
+        return total + (self.heat.nbytes if self.heat is not None else 0)
+
+    def by(self, dim: str) -> pd.DataFrame:
+        """Table of one dimension (empty if the column is missing)."""
+        return self.tables.get(dim, pd.DataFrame(columns=[dim, *CUBE_MEASURES, "er", "proxy"]))
+
+    def timeseries(self, granularity: str = "day") -> pd.DataFrame:
+        """
+        The post_day table rolled up to one of TIME_GRANULARITIES.
+
+        Days are keyed by integer period ids (Monday-start weeks, calendar
+        months) and summed with one bincount per measure, so a rollup costs
+        one pass over the days of the selection.
+
+        Args:
+            granularity: "day", "week" or "month"
+
+        Returns:
+            Table with the columns of ``by("post_day")``; post_day holds the first day of each period
+        """
+        daily = self.by("post_day")
+        if granularity == "day" or daily.empty:
+            return daily
+        if granularity not in self._rollups:
+            keys, starts = period_keys(pd.DatetimeIndex(daily["post_day"]), granularity)
+            periods, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            self._rollups[granularity] = measure_table("post_day", starts[first], {
+                name: np.bincount(inverse, weights=daily[name].to_numpy(dtype=np.float64), minlength=len(periods))
+                for name in CUBE_MEASURES
+            })
+        return self._rollups[granularity]
+
+    def heatmap(self, platform: Optional[str] = None) -> pd.DataFrame:
+        """
+        Mean engagement rate per weekday and hour.
+
+        Args:
+            platform: Optional platform to restrict the grid to
+
+        Returns:
+            DataFrame with dow, hod, er and n for every slot with at least one post
+        """
+        if self.heat is None or (platform is not None and platform not in self.heat_platforms):
+            return pd.DataFrame(columns=["dow", "hod", "er", "n"])
+        posts, er_sum, er_count = self.heat
+        if platform is not None:
+            slot = self.heat_platforms.get_loc(platform)
+            posts, er_sum, er_count = posts[slot], er_sum[slot], er_count[slot]
+        else:
+            posts, er_sum, er_count = posts.sum(axis=0), er_sum.sum(axis=0), er_count.sum(axis=0)
+        dow, hod = np.nonzero(posts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            er = np.where(er_count[dow, hod] > 0, er_sum[dow, hod] / er_count[dow, hod], np.nan)
+        return pd.DataFrame({
+            "dow": np.asarray(DAY_NAMES, dtype=object)[dow],
+            "hod": hod,
+            "er": er,
+            "n": posts[dow, hod].astype(np.int64),
+        })
+
+
+def measure_table(dim: str, values: pd.Index, sums: dict) -> pd.DataFrame:
+    """
+    Per-value table of one dimension, as AggregateBundle.by returns it.
+
+    Args:
+        dim: Dimension name, the first column
+        values: Value of each row
+        sums: Summed CUBE_MEASURES of each value
+
+    Returns:
+        Table with the CUBE_MEASURES columns plus ``er`` and ``proxy``
+    """
+    table = pd.DataFrame({dim: values})
+    for name in CUBE_MEASURES:
+        table[name] = sums[name]
+    table["posts"] = table["posts"].astype(np.int64)
+    table["er"] = (table["er_sum"] / table["er_count"]).where(table["er_count"] > 0)
+    table["proxy"] = (table["shares"] + table["comments"]) / table["posts"]
+    return table
+
+
+def period_keys(days: pd.DatetimeIndex, granularity: str):
+    """
+    Integer id and first day of the week or month of each day.
+
+    Args:
+        days: Days to key
+        granularity: "day", "week" or "month"
+
+    Returns:
+        Tuple of (int64 period ids, DatetimeIndex of period starts)
+    """
+    day_numbers = days.to_numpy().astype("datetime64[D]").astype(np.int64)
+    if granularity == "week":
+        # Day 0 (1970-01-01) is a Thursday, so shifting by 3 makes weeks start on Monday
+        keys = (day_numbers + 3) // 7
+        return keys, pd.DatetimeIndex((keys * 7 - 3).astype("datetime64[D]")).as_unit("ns")
+    if granularity == "month":
+        keys = days.to_numpy().astype("datetime64[M]").astype(np.int64)
+        return keys, pd.DatetimeIndex(keys.astype("datetime64[M]")).as_unit("ns")
+    return day_numbers, days
+
+
+def choose_granularity(start, end, max_points: int = TIMESERIES_MAX_POINTS) -> str:
+    """Finest of TIME_GRANULARITIES whose number of periods between start and end fits max_points."""
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    if days <= max_points:
+        return "day"
+    if days / 7 <= max_points:
+        return "week"
+    return "month"
+
+
+def _bincount(codes: np.ndarray, weights: np.ndarray, size: int) -> np.ndarray:
+    return np.bincount(codes, weights=weights, minlength=size)[:size]
+
+
+def _reduce(codes: dict, labels: dict, measures: dict, dimensions) -> AggregateBundle:
+    """Aggregate coded rows (or cube cells) with one bincount per dimension and measure."""
+    tables = {}
+    for dim in dimensions:
+        if dim not in codes:
+            continue
+        dim_codes = codes[dim]
+        valid = dim_codes >= 0
+        keys = dim_codes[valid]
+        size = len(labels[dim])
+        sums = {name: _bincount(keys, values[valid], size) for name, values in measures.items()}
+        observed = np.flatnonzero(sums["posts"] > 0)
+        tables[dim] = measure_table(dim, labels[dim].take(observed), {name: sums[name][observed] for name in CUBE_MEASURES})
+
+    heat = None
+    heat_platforms = labels.get("platform", pd.Index([]))
+    if "post_day" in codes and "post_hour" in codes:
+        day_codes, hour_codes = codes["post_day"], codes["post_hour"]
+        valid = (day_codes >= 0) & (hour_codes >= 0)
+        dow = np.asarray(labels["post_day"].dayofweek, dtype=np.int64)[day_codes[valid]]
+        hod = np.asarray(labels["post_hour"], dtype=np.int64)[hour_codes[valid]]
+        # Posts without a platform land in an extra slot that only counts towards "all platforms"
+        n_slots = len(heat_platforms) + 1
+        if "platform" in codes:
+            slot = codes["platform"][valid].astype(np.int64)
+            slot[slot < 0] = n_slots - 1
+        else:
+            slot = np.full(len(dow), n_slots - 1, dtype=np.int64)
+        keys = (slot * 7 + dow) * 24 + hod
+        heat = np.stack([
+            _bincount(keys, measures[name][valid], n_slots * 7 * 24).reshape(n_slots, 7, 24)
+            for name in ("posts", "er_sum", "er_count")
+        ])
+
+    totals = {name: values.sum() for name, values in measures.items()}
+    return AggregateBundle(tables, heat, heat_platforms, totals)
+
+
+def _from_cube(view, dimensions) -> AggregateBundle:
+    cells = view.cells
+    codes = {dim: cells[dim].to_numpy() for dim in view.cube.dimensions}
+    measures = {name: cells[name].to_numpy(dtype=np.float64) for name in CUBE_MEASURES}
+    return _reduce(codes, view.cube.labels, measures, dimensions)
+
+
+def _from_rows(df, dimensions) -> AggregateBundle:
+    base = getattr(df, "base", df)
+    positions = getattr(df, "positions", None)
+    encoded = get_dimension_codes(base)
+    codes = {
+        dim: dim_codes if positions is None else dim_codes[positions]
+        for dim, (dim_codes, _) in encoded.items()
+    }
+    labels = {dim: dim_labels for dim, (_, dim_labels) in encoded.items()}
+    return _reduce(codes, labels, cell_measures(base, positions), dimensions)
+
+
+def compute_aggregates(df, dimensions=TABLE_DIMENSIONS) -> AggregateBundle:
+    """
+    Aggregate a selection in one pass over its rows, or over its cube cells when it has a cube view.
+
+    Args:
+        df: DataFrame or PostSelection
+        dimensions: Dimensions to build per-value tables for
+
+    Returns:
+        AggregateBundle with every table the charts, cards and summaries read
+    """
+    cube = getattr(df, "cube", None)
+    if cube is not None:
+        return _from_cube(cube, dimensions)
+    return _from_rows(df, dimensions)
+
+
+def get_aggregates(df) -> AggregateBundle:
+    """Return the bundle of a selection, computing it at most once per PostSelection."""
+    if not isinstance(df, PostSelection):
+        return compute_aggregates(df)
+    if df.aggregates is None:
+        df.aggregates = compute_aggregates(df)
+    return df.aggregates
@@ -0,0 +1,108 @@
+"""
+Per-creator leaderboard from integer creator codes.
+"""
+import numpy as np
+import pandas as pd
+
+from modules.social.derived import derived
+from modules.social.identity import USER_ID_COLUMNS, decode_user_ids
+
+
+class CreatorCodes:
+    """
+    Dense integer code of each post's creator for one loaded frame.
+
+    UUID creators are keyed by their two 64-bit halves, other ids by their
+    text, so per-creator aggregation is a bincount over the codes.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        n = len(df)
+        self.codes = np.full(n, -1, dtype=np.int32 if n < 2**31 else np.int64)
+        if all(col in df.columns for col in USER_ID_COLUMNS):
+            hi = df[USER_ID_COLUMNS[0]].to_numpy()
+            lo = df[USER_ID_COLUMNS[1]].to_numpy()
+            keyed = np.flatnonzero((hi != 0) | (lo != 0))
+            order = keyed[np.lexsort((lo[keyed], hi[keyed]))]
+            new_creator = np.ones(len(order), dtype=bool)
+            new_creator[1:] = (hi[order][1:] != hi[order][:-1]) | (lo[order][1:] != lo[order][:-1])
+            self.codes[order] = np.cumsum(new_creator) - 1
+        if "user_id" in df.columns:
+            text_codes, _ = pd.factorize(df["user_id"])
+            has_text = text_codes >= 0
+            self.codes[has_text] = text_codes[has_text] + self.codes.max(initial=-1) + 1
+        self.n_creators = int(self.codes.max(initial=-1)) + 1
+        # A post of each creator, for labels
+        self.first_row = np.full(self.n_creators, -1, dtype=np.int64)
+        valid = np.flatnonzero(self.codes >= 0)
+        self.first_row[self.codes[valid][::-1]] = valid[::-1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.first_row.nbytes
+
+
+def get_creator_codes(df: pd.DataFrame) -> CreatorCodes:
+    """Return the creator codes of a loaded frame, building them on first use."""
+    return derived(df, "creator_codes", CreatorCodes)
+
+
+def top_creators(df, n: int = 10) -> pd.DataFrame:
+    """
+    Creators of a selection ranked by total engagement.
+
+    Args:
+        df: Loaded DataFrame or a PostSelection over one
+        n: Number of creators to return
+
+    Returns:
+        DataFrame with username, user_id, posts, engagement, er (mean engagement
+        rate) and followers (largest count seen), highest engagement first
+    """
+    columns = ["username", "user_id", "posts", "engagement", "er", "followers"]
+    base = getattr(df, "base", df)
+    creators = get_creator_codes(base)
+    positions = getattr(df, "positions", None)
+    codes = creators.codes if positions is None else creators.codes[positions]
+    valid = codes >= 0
+    if not valid.any():
+        return pd.DataFrame(columns=columns)
+    keys = codes[valid]
+
+    def column(col, fill=0.0):
+        if col not in df.columns:
+            return np.full(int(valid.sum()), fill)
+        return df[col].to_numpy(dtype=np.float64, na_value=np.nan)[valid]
+
+    size = creators.n_creators
+    rate = column("engagement_rate", np.nan)
+    followers = np.zeros(size)
+    np.maximum.at(followers, keys, np.nan_to_num(column("user_followers")))
+    posts = np.bincount(keys, minlength=size)
+    engagement = np.bincount(keys, weights=np.nan_to_num(column("engagement_total")), minlength=size)
+    er_sum = np.bincount(keys, weights=np.nan_to_num(rate), minlength=size)
+    er_count = np.bincount(keys, weights=~np.isnan(rate), minlength=size)
+
+    observed = np.flatnonzero(posts)
+    top = observed[np.lexsort((-posts[observed], -engagement[observed]))[:n]]
+    rows = creators.first_row[top]
+    if all(col in base.columns for col in USER_ID_COLUMNS):
+        user_ids = decode_user_ids(
+            base[USER_ID_COLUMNS[0]].to_numpy()[rows],
+            base[USER_ID_COLUMNS[1]].to_numpy()[rows],
+            base["user_id"].take(rows) if "user_id" in base.columns else None,
+        )
+    elif "user_id" in base.columns:
+        user_ids = base["user_id"].take(rows).reset_index(drop=True)
+    else:
+        user_ids = pd.Series([None] * len(rows), dtype=object)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        er = np.where(er_count[top] > 0, er_sum[top] / er_count[top], np.nan)
+    return pd.DataFrame({
+        "username": base["username"].take(rows).to_numpy() if "username" in base.columns else None,
+        "user_id": user_ids.to_numpy(),
+        "posts": posts[top].astype(np.int64),
+        "engagement": engagement[top].astype(np.int64),
+        "er": er,
+        "followers": followers[top].astype(np.int64),
+    }, columns=columns)
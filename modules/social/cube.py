@@ -0,0 +1,248 @@
+"""
+Pre-aggregated engagement cube over the social media frame.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.social.derived import derived
+
+# Cube keys: day x platform x sentiment x hashtag x topic x CTA x hour
+CUBE_DIMENSIONS = (
+    "post_day",
+    "platform",
+    "post_sentiment",
+    "hashtag",
+    "climate_topic",
+    "call_to_action",
+    "post_hour",
+)
+
+# Additive measures held per cell
+CUBE_MEASURES = (
+    "posts", "likes", "shares", "comments", "engagement", "engagement_sumsq", "er_sum", "er_count", "er_sumsq",
+)
+
+
+def encode_dimension(series: pd.Series):
+    """Integer codes (-1 for missing) and the labels they index, in sorted label order."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    if series.name == "post_day":
+        days = series.to_numpy().astype("datetime64[D]")
+        valid = ~np.isnat(days)
+        if not valid.any():
+            return np.full(len(series), -1), pd.DatetimeIndex([])
+        first = days[valid].min()
+        codes = np.where(valid, (days - first).astype(np.int64), -1)
+        return codes, pd.date_range(first, days[valid].max(), freq="D")
+    codes, labels = pd.factorize(series, sort=True)
+    return codes, pd.Index(labels)
+
+
+def _encode_dimensions(df: pd.DataFrame) -> dict:
+    return {dim: encode_dimension(df[dim]) for dim in CUBE_DIMENSIONS if dim in df.columns}
+
+
+def get_dimension_codes(df: pd.DataFrame) -> dict:
+    """
+    Codes and labels of every cube dimension of a loaded frame, factorized once.
+
+    Args:
+        df: Loaded DataFrame
+
+    Returns:
+        Dictionary of dimension name to (row codes, labels)
+    """
+    return derived(df, "dimension_codes", _encode_dimensions)
+
+
+class PostDates:
+    """
+    Every post_date of one loaded frame in time order, for splitting date ranges by day.
+
+    Day-partitioned structures (cube cells, quantile and heavy-hitter sketches)
+    answer the days a date range covers completely; the posts of a boundary
+    day the range only partly covers are listed here, to be added row by row.
+    When no post has a time of day no day is ever partial and nothing is kept.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        encoded = get_dimension_codes(df)
+        self.days = encoded["post_day"][1] if "post_day" in encoded else pd.DatetimeIndex([])
+        self.date_only = "post_date" not in df.columns or "post_day" not in df.columns or bool(
+            (df["post_date"].isna() | (df["post_date"] == df["post_day"])).all()
+        )
+        self.order = None
+        self.sorted_dates = None
+        if not self.date_only:
+            dates = df["post_date"].to_numpy()
+            valid = np.flatnonzero(~np.isnat(dates))
+            self.order = valid[np.argsort(dates[valid], kind="stable")]
+            self.sorted_dates = dates[self.order]
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self.date_only else self.order.nbytes + self.sorted_dates.nbytes
+
+    def split(self, date_range: tuple) -> Tuple[int, int, np.ndarray]:
+        """
+        Split an inclusive post_date range into whole days and boundary posts.
+
+        Args:
+            date_range: Tuple of (start_date, end_date), both inclusive
+
+        Returns:
+            Tuple of (lo, hi, positions): every post of day codes [lo, hi) is in
+            the range, and positions are the sorted rows of its other posts
+        """
+        start, end = (pd.to_datetime(bound) for bound in date_range[:2])
+        lo = int(self.days.searchsorted(start, side="left"))
+        if self.date_only:
+            # Posts sit on midnights, so a day is in the range exactly when its midnight is
+            return lo, int(self.days.searchsorted(end, side="right")), np.empty(0, dtype=np.int64)
+
+        # A day is whole when its last instant is not after end
+        hi = max(int(self.days.searchsorted(end - pd.Timedelta(days=1) + pd.Timedelta(1), side="right")), lo)
+
+        def position(bound, side="left"):
+            return int(np.searchsorted(self.sorted_dates, np.datetime64(bound).astype(self.sorted_dates.dtype), side=side))
+
+        first, last = position(start), position(end, side="right")
+        if lo == hi:
+            partial = self.order[first:last]
+        else:
+            whole_start, whole_end = position(self.days[lo]), position(self.days[hi - 1] + pd.Timedelta(days=1))
+            partial = np.concatenate([self.order[first:whole_start], self.order[whole_end:last]])
+        return lo, hi, np.sort(partial)
+
+
+def get_post_dates(df: pd.DataFrame) -> PostDates:
+    """Return the time-ordered post dates of a loaded frame, building them on first use."""
+    return derived(df, "post_dates", PostDates)
+
+
+def cell_measures(df: pd.DataFrame, positions: Optional[np.ndarray] = None) -> dict:
+    """Additive CUBE_MEASURES of every row, or of the rows at ``positions``."""
+    n = len(df) if positions is None else len(positions)
+
+    def column(col):
+        return df[col] if positions is None else df[col].take(positions)
+
+    def filled(col):
+        return column(col).fillna(0).to_numpy(dtype=np.float64) if col in df.columns else np.zeros(n)
+
+    rate = column("engagement_rate") if "engagement_rate" in df.columns else pd.Series(np.nan, index=range(n))
+    engagement = filled("engagement_total")
+    rate_filled = rate.fillna(0).to_numpy(dtype=np.float64)
+    return {
+        "posts": np.ones(n, dtype=np.int64),
+        "likes": filled("engagement_likes"),
+        "shares": filled("engagement_shares"),
+        "comments": filled("engagement_comments"),
+        "engagement": engagement,
+        "engagement_sumsq": engagement * engagement,
+        "er_sum": rate_filled,
+        "er_count": rate.notna().to_numpy(dtype=np.int64),
+        "er_sumsq": rate_filled * rate_filled,
+    }
+
+
+class EngagementCube:
+    """
+    Additive measures of every (day, platform, sentiment, hashtag, topic, CTA, hour) cell.
+
+    Built once per loaded frame. Filters on any cube dimension and every count,
+    sum or mean-of-ratio statistic the charts and KPIs need can be answered from
+    the cells, so their cost depends on the number of cells rather than posts.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        encoded = get_dimension_codes(df)
+        self.dimensions = list(encoded)
+        self.labels = {dim: labels for dim, (_, labels) in encoded.items()}
+        keys = {dim: codes for dim, (codes, _) in encoded.items()}
+        frame = pd.DataFrame({**keys, **cell_measures(df)})
+        self.cells = frame.groupby(self.dimensions, sort=True).sum().reset_index()
+
+        # Day cells answer whole days of a date range; partly covered days come from their rows
+        self.dates = get_post_dates(df)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.cells.memory_usage(index=False).sum())
+
+    def _codes_for(self, dim: str, values: list) -> np.ndarray:
+        codes = self.labels[dim].get_indexer(list(values))
+        return codes[codes >= 0]
+
+    def view(self,
+             platforms: list = None,
+             sentiments: list = None,
+             date_range: tuple = None,
+             hashtags: list = None,
+             frame: Optional[pd.DataFrame] = None) -> Optional["CubeView"]:
+        """
+        Cells matching the sidebar filters.
+
+        Days the date range covers completely are read from the cells; posts of
+        a boundary day it covers only partly (posts with a time of day) are
+        added as one cell each, read from ``frame``.
+
+        Args:
+            platforms: List of platforms to keep
+            sentiments: List of sentiments to keep
+            date_range: Tuple of (start_date, end_date), both inclusive
+            hashtags: List of hashtags to keep
+            frame: The loaded frame the cube was built from
+
+        Returns:
+            CubeView over the matching cells, or None if the filters cannot be answered exactly
+        """
+        filters = [
+            (dim, values)
+            for dim, values in (("platform", platforms), ("post_sentiment", sentiments), ("hashtag", hashtags))
+            if values and dim in self.labels
+        ]
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, values in filters:
+            mask &= np.isin(self.cells[dim].to_numpy(), self._codes_for(dim, values))
+
+        if not date_range or "post_day" not in self.labels:
+            return CubeView(self, self.cells[mask])
+
+        lo, hi, partial = self.dates.split(date_range)
+        codes = self.cells["post_day"].to_numpy()
+        mask &= (codes >= lo) & (codes < hi)
+        cells = self.cells[mask]
+        if len(partial):
+            if frame is None:
+                return None
+            keys = {dim: dim_codes[partial] for dim, (dim_codes, _) in get_dimension_codes(frame).items()}
+            keep = np.ones(len(partial), dtype=bool)
+            for dim, values in filters:
+                keep &= np.isin(keys[dim], self._codes_for(dim, values))
+            rows = pd.DataFrame({
+                **{dim: values[keep] for dim, values in keys.items()},
+                **{name: values[keep] for name, values in cell_measures(frame, partial).items()},
+            })
+            cells = pd.concat([cells, rows.astype(cells.dtypes.to_dict())], ignore_index=True)
+        return CubeView(self, cells)
+
+
+class CubeView:
+    """Filtered cells of an EngagementCube (plus single-post cells of partial days), aggregated by modules.social.aggregates."""
+
+    def __init__(self, cube: EngagementCube, cells: pd.DataFrame):
+        self.cube = cube
+        self.cells = cells
+
+    def __len__(self) -> int:
+        return int(self.cells["posts"].sum())
+
+
+def get_cube(df: pd.DataFrame) -> EngagementCube:
+    """Return the engagement cube for a loaded frame, building it on first use."""
+    return derived(df, "engagement_cube", EngagementCube)
+
@@ -0,0 +1,30 @@
+"""
+Structures derived from a loaded frame (indexes, cubes), shared across sessions.
+"""
+import os
+from typing import Any, Callable
+
+import pandas as pd
+
+from modules.caching import BoundedLRUCache, version_token
+
+# Keyed by dataset version, so every session sharing the registry's frame reuses one build
+DERIVED_CACHE = BoundedLRUCache(max_bytes=int(os.environ.get("DERIVED_CACHE_MAX_BYTES", 256 * 1024 * 1024)))
+
+
+def derived(df: pd.DataFrame, kind: str, build: Callable[[pd.DataFrame], Any]) -> Any:
+    """
+    Return ``build(df)``, cached per dataset version.
+
+    Args:
+        df: Loaded DataFrame
+        kind: Name of the derived structure, part of the cache key
+        build: Function building the structure from the frame
+
+    Returns:
+        The cached or freshly built structure; frames without a version are never cached
+    """
+    version = version_token(df)
+    if version is None:
+        return build(df)
+    return DERIVED_CACHE.get_or_compute((kind, version), lambda: build(df))
@@ -0,0 +1,222 @@
+"""
+Near-duplicate post clusters from MinHash signatures and locality-sensitive hashing.
+"""
+import numpy as np
+import pandas as pd
+
+from modules.social.derived import derived
+from modules.social.storage import load_snapshot_array, save_snapshot_array
+from modules.social.tokens import tokenize
+
+# Consecutive words per shingle
+SHINGLE_WORDS = 3
+
+# MinHash signature length, split into LSH bands of MINHASH_PERMUTATIONS // LSH_BANDS values.
+# Two posts become candidates when any band matches; with 8 bands of 4 that is
+# likely above a Jaccard similarity of about (1 / 8) ** (1 / 4) ~ 0.6.
+MINHASH_PERMUTATIONS = 32
+LSH_BANDS = 8
+
+# Posts are clustered when the exact Jaccard similarity of their shingle sets reaches this
+DUPLICATE_THRESHOLD = 0.6
+
+# Distinct texts shingled at a time, which bounds the transient memory of a signature pass
+SIGNATURE_CHUNK_ROWS = 50_000
+
+# Universal hashing modulo a Mersenne prime keeps every product inside uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_SEED = 20240601
+
+
+def _shingle_hashes(text: pd.Series):
+    """
+    Hash every run of SHINGLE_WORDS consecutive words of each text.
+
+    Words are hashed by value, so the same shingle hashes alike in every call.
+
+    Returns:
+        Tuple of (row position of each shingle, hashes in [0, _PRIME)); rows are ascending
+    """
+    rows, tokens = tokenize(text)
+    codes = (pd.util.hash_pandas_object(tokens, index=False).to_numpy() % np.uint64(int(_PRIME) - 1)).astype(np.int64)
+    hashes = np.zeros(len(codes), dtype=np.int64)
+    for offset in range(SHINGLE_WORDS):
+        # Words past the end of their post count as a sentinel, so short posts still get shingles
+        shifted = np.full(len(codes), -1, dtype=np.int64)
+        if offset < len(codes):
+            same_post = rows[offset:] == rows[:len(rows) - offset]
+            shifted[:len(codes) - offset] = np.where(same_post, codes[offset:], -1)
+        hashes = (hashes * 1_000_003 + shifted + 1) % int(_PRIME)
+    return rows, hashes.astype(np.uint64)
+
+
+def minhash_signatures(text: pd.Series, chunksize: int = SIGNATURE_CHUNK_ROWS):
+    """
+    MinHash signatures of the shingle sets of a text column, computed chunk by chunk.
+
+    Args:
+        text: Text column
+        chunksize: Texts shingled at a time
+
+    Returns:
+        Tuple of (row positions with at least one word, uint32 signatures of
+        shape MINHASH_PERMUTATIONS x rows)
+    """
+    rng = np.random.default_rng(_SEED)
+    a = rng.integers(1, int(_PRIME), MINHASH_PERMUTATIONS, dtype=np.uint64)
+    b = rng.integers(0, int(_PRIME), MINHASH_PERMUTATIONS, dtype=np.uint64)
+    text = text.reset_index(drop=True)
+    positions, signatures = [], []
+    for start in range(0, len(text), chunksize):
+        rows, hashes = _shingle_hashes(text.iloc[start:start + chunksize])
+        starts = np.flatnonzero(np.diff(rows, prepend=-1))
+        chunk = np.empty((MINHASH_PERMUTATIONS, len(starts)), dtype=np.uint32)
+        for j in range(MINHASH_PERMUTATIONS):
+            if len(starts):
+                chunk[j] = np.minimum.reduceat((a[j] * hashes + b[j]) % _PRIME, starts)
+        positions.append(rows[starts] + start)
+        signatures.append(chunk)
+    if not positions:
+        return np.zeros(0, dtype=np.int64), np.empty((MINHASH_PERMUTATIONS, 0), dtype=np.uint32)
+    return np.concatenate(positions), np.concatenate(signatures, axis=1)
+
+
+def shingle_jaccard(text: pd.Series, left: np.ndarray, right: np.ndarray,
+                    chunksize: int = SIGNATURE_CHUNK_ROWS) -> np.ndarray:
+    """
+    Exact Jaccard similarity of the shingle sets of pairs of texts.
+
+    Args:
+        text: Text column
+        left: Positions of the first text of each pair
+        right: Positions of the second text of each pair
+        chunksize: Pairs compared at a time
+
+    Returns:
+        Float array with one similarity per pair (0 for a pair with no shingles)
+    """
+    text = text.reset_index(drop=True)
+    return np.concatenate([np.zeros(0)] + [
+        _pair_jaccard(text, left[start:start + chunksize], right[start:start + chunksize])
+        for start in range(0, len(left), chunksize)
+    ])
+
+
+def _pair_jaccard(text: pd.Series, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """shingle_jaccard of one batch of pairs."""
+    involved = np.unique(np.concatenate([left, right]))
+    rows, hashes = _shingle_hashes(text.take(involved))
+    # Shingle sets: one entry per distinct (text, shingle), grouped by text
+    pairs = np.unique(rows.astype(np.uint64) << np.uint64(32) | hashes)
+    set_rows = (pairs >> np.uint64(32)).astype(np.int64)
+    set_hashes = pairs & np.uint64(0xFFFFFFFF)
+    offsets = np.searchsorted(set_rows, np.arange(len(involved) + 1))
+    sizes = np.diff(offsets)
+
+    def members(side):
+        local = np.searchsorted(involved, side)
+        counts = sizes[local]
+        pair_ids = np.repeat(np.arange(len(side), dtype=np.uint64), counts)
+        # Position of every member shingle of every pair's text in the set arrays
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return pair_ids << np.uint64(32) | set_hashes[np.repeat(offsets[local], counts) + within], counts
+
+    left_keys, left_sizes = members(left)
+    right_keys, right_sizes = members(right)
+    shared = np.intersect1d(left_keys, right_keys, assume_unique=True)
+    intersection = np.bincount((shared >> np.uint64(32)).astype(np.int64), minlength=len(left))
+    union = left_sizes + right_sizes - intersection
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(union > 0, intersection / union, 0.0)
+
+
+def _components(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Smallest node of the connected component of every node, by min-label propagation."""
+    labels = np.arange(n)
+    while True:
+        updated = labels.copy()
+        np.minimum.at(updated, left, labels[right])
+        np.minimum.at(updated, right, labels[left])
+        # Labels only ever point to smaller nodes, so pointer jumping shortcuts chains
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def near_duplicate_clusters(df: pd.DataFrame, column: str = "post_text") -> np.ndarray:
+    """
+    Assign every post a near-duplicate cluster id.
+
+    Identical texts are clustered directly and only distinct texts are
+    MinHashed. Texts whose MinHash values collide in any LSH band become
+    candidates (each band pairs a text with the first text sharing the band,
+    so the work is linear in the number of texts) and are linked when the
+    exact Jaccard similarity of their shingle sets reaches DUPLICATE_THRESHOLD.
+    Linked texts form components; a member less similar than that to its
+    component's first text is split off, so every post of a cluster is a
+    near duplicate of the post the cluster is collapsed into.
+
+    Args:
+        df: Frame with a text column
+        column: Text column to compare
+
+    Returns:
+        Array with, for each row, the position of the first post of its cluster
+        (a post with no near duplicate is its own cluster)
+    """
+    n_rows = len(df)
+    dtype = np.int32 if n_rows < 2**31 else np.int64
+    if column not in df.columns or n_rows == 0:
+        return np.arange(n_rows, dtype=dtype)
+
+    text_codes, texts = pd.factorize(df[column])
+    texts = pd.Series(np.asarray(texts, dtype=object))
+    positions, signatures = minhash_signatures(texts)
+    n = len(texts)
+    band_rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    candidates = []
+    for band in range(LSH_BANDS):
+        # Fold the band into one 64-bit key; a rare key collision fails the exact check
+        key = np.zeros(len(positions), dtype=np.uint64)
+        for values in signatures[band * band_rows:(band + 1) * band_rows]:
+            key = key * np.uint64(0x9E3779B97F4A7C15) + values
+        _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        leader = first[inverse]
+        candidate = np.flatnonzero(leader != np.arange(len(positions)))
+        candidates.append(positions[candidate] * n + positions[leader[candidate]])
+    left, right = np.divmod(np.unique(np.concatenate(candidates)), n) if n else (np.zeros(0, np.int64),) * 2
+    linked = shingle_jaccard(texts, left, right) >= DUPLICATE_THRESHOLD
+
+    # Factorized texts are numbered by first appearance, so the smallest text comes first
+    labels = _components(n, left[linked], right[linked])
+    members = np.flatnonzero(labels != np.arange(n))
+    distant = shingle_jaccard(texts, members, labels[members]) < DUPLICATE_THRESHOLD
+    labels[members[distant]] = members[distant]
+
+    first_row = np.full(n, n_rows, dtype=np.int64)
+    np.minimum.at(first_row, text_codes[text_codes >= 0], np.flatnonzero(text_codes >= 0))
+    clusters = np.arange(n_rows, dtype=dtype)
+    has_text = text_codes >= 0
+    clusters[has_text] = first_row[labels[text_codes[has_text]]]
+    return clusters
+
+
+def _stored_clusters(df: pd.DataFrame) -> np.ndarray:
+    """Cluster ids saved with the frame's snapshot, clustering and saving them when missing."""
+    clusters = load_snapshot_array(df, "clusters")
+    if clusters is None:
+        clusters = near_duplicate_clusters(df)
+        save_snapshot_array(df, "clusters", clusters)
+    return clusters
+
+
+def get_duplicate_clusters(df: pd.DataFrame) -> np.ndarray:
+    """
+    Return the near-duplicate cluster of every post of a loaded frame.
+
+    Clustered on first use, then kept in memory per dataset version and on
+    disk beside the snapshot, so later processes load the ids instead of
+    clustering again until the source changes.
+    """
+    return derived(df, "duplicate_clusters", _stored_clusters)
@@ -0,0 +1,138 @@
+"""
+Inverted index over the social media frame for resolving sidebar filters.
+"""
+import numpy as np
+import pandas as pd
+
+from modules.social.derived import derived
+
+# Categorical columns the sidebar filters on
+FILTER_DIMENSIONS = ("platform", "post_sentiment", "hashtag")
+
+
+class FilterIndex:
+    """
+    Precomputed filter structures for one loaded frame.
+
+    Each categorical filter dimension keeps its row positions grouped by value
+    (one stable argsort of the value codes, sliced by per-value offsets), so
+    the index costs one position per row and dimension whatever the number of
+    distinct values. ``post_date`` is kept as a sorted position array so date
+    ranges resolve with a binary search. Filters resolve to row positions
+    without touching the frame itself.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        position_dtype = np.int32 if self.n_rows < 2**31 else np.int64
+        # Per dimension: value -> code, offsets into rows, and rows grouped by code
+        self.codes = {}
+        self.offsets = {}
+        self.rows = {}
+        for col in FILTER_DIMENSIONS:
+            if col in df.columns:
+                codes, uniques = pd.factorize(df[col])
+                order = np.argsort(codes, kind="stable").astype(position_dtype)
+                counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+                # Missing values sort first and are never selected
+                self.rows[col] = order[len(codes) - counts.sum():]
+                self.offsets[col] = np.concatenate([[0], np.cumsum(counts)])
+                self.codes[col] = {value: code for code, value in enumerate(uniques)}
+
+        self.date_order = None
+        self.sorted_dates = None
+        if "post_date" in df.columns:
+            dates = df["post_date"].to_numpy()
+            valid = np.flatnonzero(~np.isnat(dates))
+            self.date_order = valid[np.argsort(dates[valid], kind="stable")].astype(position_dtype)
+            self.sorted_dates = dates[self.date_order]
+
+    @property
+    def nbytes(self) -> int:
+        total = sum(rows.nbytes for rows in self.rows.values())
+        total += sum(offsets.nbytes for offsets in self.offsets.values())
+        if self.date_order is not None:
+            total += self.date_order.nbytes + self.sorted_dates.nbytes
+        return total
+
+    def _value_rows(self, col: str, values: list) -> np.ndarray:
+        """Row positions holding any of the selected values of one dimension."""
+        codes = sorted({self.codes[col][value] for value in values if value in self.codes[col]})
+        offsets, rows = self.offsets[col], self.rows[col]
+        return np.concatenate([rows[offsets[code]:offsets[code + 1]] for code in codes] or [rows[:0]])
+
+    def _date_rows(self, date_range: tuple) -> np.ndarray:
+        """Row positions whose post_date lies in the inclusive range."""
+        start, end = (
+            np.datetime64(pd.to_datetime(bound)).astype(self.sorted_dates.dtype)
+            for bound in date_range[:2]
+        )
+        lo = np.searchsorted(self.sorted_dates, start, side="left")
+        hi = np.searchsorted(self.sorted_dates, end, side="right")
+        return self.date_order[lo:hi]
+
+    def select(self,
+               platforms: list = None,
+               sentiments: list = None,
+               date_range: tuple = None,
+               hashtags: list = None) -> np.ndarray:
+        """
+        Resolve filters to row positions.
+
+        Args:
+            platforms: List of platforms to keep
+            sentiments: List of sentiments to keep
+            date_range: Tuple of (start_date, end_date), both inclusive
+            hashtags: List of hashtags to keep
+
+        Returns:
+            Sorted array of matching row positions
+        """
+        matches = []
+        for col, values in (("platform", platforms), ("post_sentiment", sentiments), ("hashtag", hashtags)):
+            if values and col in self.rows:
+                matches.append(self._value_rows(col, values))
+        if date_range and self.sorted_dates is not None:
+            matches.append(self._date_rows(date_range))
+
+        if not matches:
+            return np.arange(self.n_rows)
+        if len(matches) == 1:
+            return np.sort(matches[0]).astype(np.int64)
+        # Each filter lists a row at most once, so rows hit by every filter match
+        hits = np.zeros(self.n_rows, dtype=np.uint8)
+        for rows in matches:
+            hits[rows] += 1
+        return np.flatnonzero(hits == len(matches))
+
+
+def _filter_domain(df: pd.DataFrame) -> dict:
+    """Distinct values of each filter dimension and whether it has missing values."""
+    domain = {}
+    for col in FILTER_DIMENSIONS:
+        if col in df.columns:
+            codes, uniques = pd.factorize(df[col])
+            domain[col] = (frozenset(uniques), bool((codes < 0).any()))
+    return domain
+
+
+def keeps_all(df: pd.DataFrame, col: str, values: list) -> bool:
+    """
+    Whether a value filter on col keeps every row of a loaded frame.
+
+    True without a filter, or when every value of a column with no missing
+    values is selected. Answered from a small per-version summary, so callers
+    can decide this without building the FilterIndex.
+    """
+    if not values:
+        return True
+    domain = derived(df, "filter_domain", _filter_domain)
+    if col not in domain:
+        return True
+    uniques, has_missing = domain[col]
+    return not has_missing and uniques <= set(values)
+
+
+def get_filter_index(df: pd.DataFrame) -> FilterIndex:
+    """Return the filter index for a loaded frame, building it on first use."""
+    return derived(df, "filter_index", FilterIndex)
@@ -0,0 +1,103 @@
+"""
+City and country codes parsed from user_location, and the per-country breakdown.
+"""
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Columns added at load, both categorical
+LOCATION_COLUMNS = ("user_city", "user_country")
+
+
+def split_location(location: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Split "City, Country" strings into city and country.
+
+    The first comma-separated part is the city and the last the country, so
+    "Austin, Texas, USA" is Austin in USA; a value without a comma is taken
+    as a country with no city.
+
+    Args:
+        location: Distinct location strings
+
+    Returns:
+        Tuple of (cities, countries), missing where the part is absent
+    """
+    parts = location.astype("str").str.split(",")
+    has_city = (parts.str.len() > 1).to_numpy()
+    city = parts.str[0].str.strip().where(has_city)
+    country = parts.str[-1].str.strip()
+    return city.where(city != ""), country.where(country != "")
+
+
+def _recode(row_codes: np.ndarray, values: pd.Series) -> pd.Categorical:
+    """Categorical of the parsed value of each row, from the row's code into the distinct locations."""
+    value_codes, labels = pd.factorize(values, sort=True)
+    codes = np.where(row_codes >= 0, value_codes[np.maximum(row_codes, 0)], -1) if len(value_codes) else row_codes
+    return pd.Categorical.from_codes(codes, categories=pd.Index(labels, dtype="str"))
+
+
+def parse_locations(location: pd.Series) -> Tuple[pd.Categorical, pd.Categorical]:
+    """
+    Dictionary-encoded city and country of every row.
+
+    Each distinct location is parsed once, so the cost grows with the number
+    of distinct locations; rows are only recoded with integer takes.
+
+    Args:
+        location: user_location column (categorical or text)
+
+    Returns:
+        Tuple of (city, country) categoricals aligned with the rows
+    """
+    if isinstance(location.dtype, pd.CategoricalDtype):
+        row_codes, uniques = location.cat.codes.to_numpy(), location.cat.categories
+    else:
+        row_codes, uniques = pd.factorize(location)
+    city, country = split_location(pd.Series(uniques, dtype=object))
+    return _recode(row_codes, city), _recode(row_codes, country)
+
+
+def country_breakdown(df) -> pd.DataFrame:
+    """
+    Posts, total engagement and mean engagement rate per country.
+
+    Args:
+        df: DataFrame or PostSelection with a user_country column
+
+    Returns:
+        DataFrame with country, posts, engagement, er and share (of the posts
+        with a known country), most posts first
+    """
+    columns = ["country", "posts", "engagement", "er", "share"]
+    if "user_country" not in df.columns:
+        return pd.DataFrame(columns=columns)
+    country = df["user_country"]
+    if not isinstance(country.dtype, pd.CategoricalDtype):
+        country = country.astype("category")
+    codes = country.cat.codes.to_numpy()
+    valid = codes >= 0
+    keys = codes[valid]
+    size = len(country.cat.categories)
+
+    def values(col):
+        if col not in df.columns:
+            return np.full(int(valid.sum()), np.nan)
+        return df[col].to_numpy(dtype=np.float64, na_value=np.nan)[valid]
+
+    rate = values("engagement_rate")
+    posts = np.bincount(keys, minlength=size)
+    engagement = np.bincount(keys, weights=np.nan_to_num(values("engagement_total")), minlength=size)
+    er_sum = np.bincount(keys, weights=np.nan_to_num(rate), minlength=size)
+    er_count = np.bincount(keys, weights=~np.isnan(rate), minlength=size)
+
+    observed = np.flatnonzero(posts)
+    table = pd.DataFrame({
+        "country": country.cat.categories.take(observed),
+        "posts": posts[observed].astype(np.int64),
+        "engagement": engagement[observed].astype(np.int64),
+        "er": np.where(er_count[observed] > 0, er_sum[observed] / np.maximum(er_count[observed], 1), np.nan),
+    })
+    table["share"] = table["posts"] / max(int(table["posts"].sum()), 1)
+    return table.sort_values(["posts", "engagement"], ascending=False, kind="stable").reset_index(drop=True)[columns]
@@ -0,0 +1,91 @@
+"""
+Compact 128-bit encoding of the user_id column.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Halves of the 128-bit user_id; 0/0 (the nil UUID) marks an id that is missing or not a UUID
+USER_ID_COLUMNS = ("user_id_hi", "user_id_lo")
+
+# Only the canonical lowercase form is encoded, so decoding gives back the exact text
+UUID_PATTERN = r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+# Value of each ASCII hex digit, either case
+_HEX_VALUES = np.zeros(256, dtype=np.uint64)
+_HEX_VALUES[_HEX_DIGITS] = np.arange(16)
+_HEX_VALUES[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+
+
+def encode_user_ids(user_id: pd.Series) -> Tuple[np.ndarray, np.ndarray, pd.Series]:
+    """
+    Split canonical UUID strings into two unsigned 64-bit halves.
+
+    Args:
+        user_id: Raw user_id column
+
+    Returns:
+        Tuple of (high halves, low halves, residual ids): ids that are not UUIDs
+        keep their text in the residual column (missing for every parsed id and
+        every missing id)
+    """
+    text = user_id.astype("string").reset_index(drop=True)
+    is_uuid = text.str.fullmatch(UUID_PATTERN).fillna(False).to_numpy(dtype=bool)
+    hi = np.zeros(len(text), dtype=np.uint64)
+    lo = np.zeros(len(text), dtype=np.uint64)
+    if is_uuid.any():
+        digits = "".join(text[is_uuid].str.replace("-", "", regex=False).tolist()).encode("ascii")
+        nibbles = _HEX_VALUES[np.frombuffer(digits, dtype=np.uint8).reshape(-1, 32)]
+        for half, columns in ((hi, nibbles[:, :16]), (lo, nibbles[:, 16:])):
+            value = np.zeros(len(columns), dtype=np.uint64)
+            for column in columns.T:
+                value = (value << np.uint64(4)) | column
+            half[is_uuid] = value
+        # Encoded ids must decode to their own text, or exports would change
+        decoded = decode_user_ids(hi[is_uuid], lo[is_uuid])
+        mismatch = np.flatnonzero(is_uuid)[decoded.to_numpy() != text[is_uuid].to_numpy(dtype=object)]
+        hi[mismatch] = lo[mismatch] = 0
+        is_uuid[mismatch] = False
+    # Missing ids stay missing (an object column, so no "<NA>" text is ever made)
+    residual = text.where(~is_uuid).astype(object).where(lambda ids: ids.notna(), None)
+    return hi, lo, residual
+
+
+def decode_user_ids(hi: np.ndarray, lo: np.ndarray, residual: Optional[pd.Series] = None) -> pd.Series:
+    """
+    Format 128-bit halves back into UUID strings.
+
+    Args:
+        hi: High halves
+        lo: Low halves
+        residual: Ids that were not UUIDs, used where present
+
+    Returns:
+        String Series with the original ids, UUIDs in lowercase (missing where there was none)
+    """
+    shifts = np.arange(60, -1, -4, dtype=np.uint64)
+    nibbles = np.concatenate([
+        (np.asarray(half, dtype=np.uint64)[:, None] >> shifts) & np.uint64(15) for half in (hi, lo)
+    ], axis=1)
+    chars = _HEX_DIGITS[nibbles.astype(np.intp)]
+    chars = np.insert(chars, [8, 12, 16, 20], ord("-"), axis=1)
+    ids = pd.Series(np.ascontiguousarray(chars).view("S36").ravel(), dtype=object).str.decode("ascii")
+    ids = ids.astype("str").where((np.asarray(hi) != 0) | (np.asarray(lo) != 0))
+    if residual is not None:
+        residual = pd.Series(residual).reset_index(drop=True)
+        ids = ids.where(residual.isna().to_numpy(), residual.astype("str"))
+    return ids
+
+
+def restore_user_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """Replace the user_id halves of a materialized frame with the original user_id strings (for exports)."""
+    if not all(col in df.columns for col in USER_ID_COLUMNS):
+        return df
+    residual = df["user_id"] if "user_id" in df.columns else None
+    ids = decode_user_ids(df[USER_ID_COLUMNS[0]].to_numpy(), df[USER_ID_COLUMNS[1]].to_numpy(), residual)
+    position = df.columns.get_loc(USER_ID_COLUMNS[0])
+    df = df.drop(columns=[*USER_ID_COLUMNS, *(["user_id"] if residual is not None else [])])
+    df.insert(min(position, len(df.columns)), "user_id", ids.to_numpy())
+    return df
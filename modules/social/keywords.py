@@ -0,0 +1,169 @@
+"""
+Distinctive post_text keywords per topic, platform or sentiment from a sparse term-document matrix.
+"""
+import numpy as np
+import pandas as pd
+
+from modules.social.cube import get_dimension_codes
+from modules.social.derived import derived
+from modules.social.text_index import get_text_index
+
+# Dimensions the Topic Insights tab can group keywords by
+KEYWORD_DIMENSIONS = ("climate_topic", "platform", "post_sentiment")
+
+# Function words that are frequent everywhere and never distinctive
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "for", "from", "has", "have", "in",
+    "into", "is", "it", "its", "of", "on", "or", "our", "over", "that", "the", "their", "this",
+    "through", "to", "via", "was", "we", "while", "will", "with", "you", "your",
+))
+
+# Pseudo-posts of the prior that shrinks rare words towards the corpus rate
+PRIOR_POSTS = 500
+
+# A keyword must appear in at least this many posts of its group
+MIN_KEYWORD_POSTS = 3
+
+# Above this many group x word cells, counts are merged by sorting instead of a dense bincount
+_DENSE_CELLS = 1 << 22
+
+
+class TermMatrix:
+    """
+    Sparse post x word incidence of the keyword-eligible words of one loaded frame.
+
+    Entries are read from the post_text index postings (word-major, one entry
+    per word and post), so building it never re-tokenizes the text. Stop words,
+    words shorter than three characters and numbers are dropped.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        index = get_text_index(df)
+        vocabulary = pd.Series(index.vocabulary, dtype=object)
+        eligible = (
+            (vocabulary.str.len() >= 3)
+            & ~vocabulary.isin(STOPWORDS)
+            & ~vocabulary.str.isdigit()
+        ).to_numpy(dtype=bool)
+        words = np.repeat(np.arange(len(vocabulary)), np.diff(index.offsets))
+        keep = eligible[words]
+        self.vocabulary = index.vocabulary
+        self.n_rows = len(df)
+        self.rows = index.postings[keep]
+        self.words = words[keep].astype(np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.words.nbytes
+
+    def group_counts(self, group_codes: np.ndarray, n_groups: int, selected=None):
+        """
+        Posts containing each word, per group.
+
+        Args:
+            group_codes: Group code of every row of the frame (-1 for none)
+            n_groups: Number of groups
+            selected: Optional boolean mask of the rows to count
+
+        Returns:
+            Tuple of (group, word, posts) arrays for every non-zero cell
+        """
+        entry_groups = group_codes[self.rows].astype(np.int64)
+        valid = entry_groups >= 0
+        if selected is not None:
+            valid &= selected[self.rows]
+        n_words = len(self.vocabulary)
+        keys = entry_groups[valid] * n_words + self.words[valid]
+        if n_groups * n_words <= _DENSE_CELLS:
+            counts = np.bincount(keys, minlength=n_groups * n_words)
+            keys = np.flatnonzero(counts)
+            counts = counts[keys]
+        else:
+            keys, counts = np.unique(keys, return_counts=True)
+        groups, words = np.divmod(keys, n_words)
+        return groups, words, counts
+
+
+def get_term_matrix(df: pd.DataFrame) -> TermMatrix:
+    """Return the term matrix for a loaded frame, building it on first use."""
+    return derived(df, "term_matrix", TermMatrix)
+
+
+def distinctive_keywords(df, dim: str, top: int = 5) -> pd.DataFrame:
+    """
+    Words that set each value of a dimension apart from the rest of a selection.
+
+    Words are ranked by the z-score of the log-odds ratio of appearing in a post
+    of the group versus a post of the other groups, with an informative prior
+    of PRIOR_POSTS posts at the selection-wide rate (Monroe et al., 2008).
+
+    Args:
+        df: Loaded DataFrame or a PostSelection over one
+        dim: One of KEYWORD_DIMENSIONS
+        top: Keywords kept per group
+
+    Returns:
+        DataFrame with dim, keyword, posts (in the group), share (of the group's
+        posts) and score, best first within each group in label order
+    """
+    columns = [dim, "keyword", "posts", "share", "score"]
+    base = getattr(df, "base", df)
+    encoded = get_dimension_codes(base)
+    if dim not in encoded or "post_text" not in base.columns:
+        return pd.DataFrame(columns=columns)
+    codes, labels = encoded[dim]
+    positions = getattr(df, "positions", None)
+    selected = None
+    if positions is not None:
+        selected = np.zeros(len(base), dtype=bool)
+        selected[positions] = True
+
+    matrix = get_term_matrix(base)
+    groups, words, counts = matrix.group_counts(codes, len(labels), selected)
+    group_codes = codes if positions is None else codes[positions]
+    group_posts = np.bincount(group_codes[group_codes >= 0], minlength=len(labels)).astype(np.float64)
+    total_posts = group_posts.sum()
+    if not len(counts) or total_posts == 0:
+        return pd.DataFrame(columns=columns)
+
+    word_posts = np.bincount(words, weights=counts, minlength=len(matrix.vocabulary))
+    prior = PRIOR_POSTS * word_posts[words] / total_posts
+    in_group = counts.astype(np.float64)
+    out_group = word_posts[words] - in_group
+    n_in, n_out = group_posts[groups], total_posts - group_posts[groups]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = (
+            np.log((in_group + prior) / (n_in - in_group + prior))
+            - np.log((out_group + prior) / (n_out - out_group + prior))
+        )
+        variance = (
+            1 / (in_group + prior) + 1 / (n_in - in_group + prior)
+            + 1 / (out_group + prior) + 1 / (n_out - out_group + prior)
+        )
+        score = delta / np.sqrt(variance)
+
+    table = pd.DataFrame({
+        "group": groups,
+        "keyword": matrix.vocabulary[words],
+        "posts": counts.astype(np.int64),
+        "share": in_group / n_in,
+        "score": score,
+    })
+    table = table[(table["posts"] >= MIN_KEYWORD_POSTS) & np.isfinite(table["score"])]
+    table = (
+        table.sort_values(["group", "score"], ascending=[True, False], kind="stable")
+        .groupby("group", sort=False)
+        .head(top)
+    )
+    table.insert(0, dim, labels.take(table.pop("group").to_numpy()))
+    return table.reset_index(drop=True)[columns]
+
+
+def get_keywords(df, dim: str) -> pd.DataFrame:
+    """Return the distinctive keywords of a selection, computing them at most once per PostSelection and dimension."""
+    cache = getattr(df, "keywords", None)
+    if cache is None:
+        return distinctive_keywords(df, dim)
+    if dim not in cache:
+        cache[dim] = distinctive_keywords(df, dim)
+    return cache[dim]
@@ -0,0 +1,179 @@
+"""
+Mergeable quantile sketches of engagement_rate for percentile thresholds.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.social.cube import get_dimension_codes, get_post_dates
+from modules.social.derived import derived
+
+# Points kept per partition. A partition of n posts is summarized by at most
+# this many points, each standing for a block of at most ceil(n / capacity)
+# consecutive values, so a rank read from it is off by less than one block.
+QUANTILE_CAPACITY = 128
+
+# Sketch partitions: day x platform x sentiment
+QUANTILE_DIMENSIONS = ("post_day", "platform", "post_sentiment")
+
+
+class QuantileSummary:
+    """
+    Weighted sorted points standing for the engagement rates of a set of posts.
+
+    ``rank_error`` is the most posts any rank (and so any count above a
+    threshold) can be off by; it is 0 when every partition merged held at
+    most QUANTILE_CAPACITY posts, in which case the summary is exact.
+    """
+
+    def __init__(self, values: np.ndarray, weights: np.ndarray, rank_error: int):
+        order = np.argsort(values, kind="stable")
+        self.values = values[order]
+        self.cumulative = np.cumsum(weights[order])
+        self.rank_error = rank_error
+
+    @property
+    def count(self) -> int:
+        return int(self.cumulative[-1]) if len(self.cumulative) else 0
+
+    def _value_at(self, rank: int) -> float:
+        return float(self.values[np.searchsorted(self.cumulative, rank, side="right")])
+
+    def quantile(self, q: float) -> float:
+        """Quantile with linear interpolation between ranks, like pandas' default."""
+        if self.count == 0:
+            return float("nan")
+        position = q * (self.count - 1)
+        lower = int(np.floor(position))
+        value = self._value_at(lower)
+        if lower + 1 < self.count:
+            value += (position - lower) * (self._value_at(lower + 1) - value)
+        return value
+
+    def count_above(self, threshold: float) -> int:
+        """Number of posts with a rate strictly above threshold."""
+        at_or_below = np.searchsorted(self.values, threshold, side="right")
+        return self.count - (int(self.cumulative[at_or_below - 1]) if at_or_below else 0)
+
+    def at_least(self, threshold: float) -> "QuantileSummary":
+        """Summary of the posts with a rate of at least threshold."""
+        keep = np.searchsorted(self.values, threshold, side="left")
+        weights = np.diff(self.cumulative, prepend=0)[keep:]
+        return QuantileSummary(self.values[keep:], weights, self.rank_error)
+
+
+class QuantileSketches:
+    """
+    Per-partition quantile summaries of engagement_rate for one loaded frame.
+
+    Each day x platform x sentiment partition keeps the last value of each
+    of at most QUANTILE_CAPACITY equal-count blocks of its sorted rates (a
+    single-level KLL compaction). Summaries of the partitions matching the
+    sidebar filters merge by concatenation, so a percentile costs
+    O(partitions x capacity) whatever the number of posts.
+    """
+
+    def __init__(self, df: pd.DataFrame, capacity: int = QUANTILE_CAPACITY):
+        self.capacity = capacity
+        encoded = get_dimension_codes(df)
+        self.labels = {dim: encoded[dim][1] for dim in QUANTILE_DIMENSIONS if dim in encoded}
+
+        rate = df["engagement_rate"].to_numpy(dtype=np.float64) if "engagement_rate" in df.columns else np.full(len(df), np.nan)
+        valid = ~np.isnan(rate)
+        keys = [
+            encoded[dim][0][valid].astype(np.int64) if dim in encoded else np.full(int(valid.sum()), -1)
+            for dim in QUANTILE_DIMENSIONS
+        ]
+        # One id per observed (day, platform, sentiment); missing codes form their own partitions
+        combined = np.zeros(len(keys[0]), dtype=np.int64)
+        for codes in keys:
+            combined = combined * (int(codes.max(initial=-1)) + 2) + codes + 1
+        uniques, first, partition = np.unique(combined, return_index=True, return_inverse=True)
+        self.keys = {dim: codes[first] for dim, codes in zip(QUANTILE_DIMENSIONS, keys)}
+
+        values = rate[valid]
+        order = np.lexsort((values, partition))
+        values, partition = values[order], partition[order]
+        sizes = np.bincount(partition, minlength=len(uniques))
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        rank = np.arange(len(values)) - starts[partition]
+
+        # Block b of a partition of n posts holds ranks with floor(rank * capacity / n) == b
+        block = rank * capacity // sizes[partition]
+        last = np.ones(len(values), dtype=bool)
+        last[:-1] = (block[1:] != block[:-1]) | (partition[1:] != partition[:-1])
+        kept_rank = rank[last] + 1
+        kept_partition = partition[last]
+        weights = np.diff(kept_rank, prepend=0)
+        new_partition = np.ones(len(kept_rank), dtype=bool)
+        new_partition[1:] = kept_partition[1:] != kept_partition[:-1]
+        weights[new_partition] = kept_rank[new_partition]
+
+        self.values = values[last]
+        self.weights = weights
+        self.entry_partition = kept_partition
+        self.partition_error = -(-sizes // capacity) - 1
+
+        # Whole days come from the partitions, posts of partly covered days from their rows
+        self.dates = get_post_dates(df)
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.values.nbytes + self.weights.nbytes + self.entry_partition.nbytes
+            + self.partition_error.nbytes + sum(codes.nbytes for codes in self.keys.values())
+        )
+
+    def summary(self,
+                platforms: list = None,
+                sentiments: list = None,
+                date_range: tuple = None,
+                frame: Optional[pd.DataFrame] = None) -> Optional[QuantileSummary]:
+        """
+        Merge the partitions matching the sidebar filters.
+
+        Posts of a boundary day the date range covers only partly are added
+        exactly, one point each, from ``frame``.
+
+        Args:
+            platforms: List of platforms to keep
+            sentiments: List of sentiments to keep
+            date_range: Tuple of (start_date, end_date), both inclusive
+            frame: The loaded frame the sketches were built from
+
+        Returns:
+            QuantileSummary of the matching posts, or None if the filters do not align with partitions
+        """
+        filters = []
+        mask = np.ones(len(self.partition_error), dtype=bool)
+        for dim, values in (("platform", platforms), ("post_sentiment", sentiments)):
+            if values and dim in self.labels:
+                codes = self.labels[dim].get_indexer(list(values))
+                filters.append((dim, codes[codes >= 0]))
+                mask &= np.isin(self.keys[dim], filters[-1][1])
+
+        partial = np.empty(0, dtype=np.int64)
+        if date_range and "post_day" in self.labels:
+            lo, hi, partial = self.dates.split(date_range)
+            mask &= (self.keys["post_day"] >= lo) & (self.keys["post_day"] < hi)
+
+        entries = mask[self.entry_partition]
+        values, weights = self.values[entries], self.weights[entries]
+        if len(partial):
+            if frame is None or "engagement_rate" not in frame.columns:
+                return None
+            encoded = get_dimension_codes(frame)
+            keep = np.ones(len(partial), dtype=bool)
+            for dim, codes in filters:
+                keep &= np.isin(encoded[dim][0][partial], codes)
+            rates = frame["engagement_rate"].take(partial[keep]).to_numpy(dtype=np.float64, na_value=np.nan)
+            rates = rates[~np.isnan(rates)]
+            values = np.concatenate([values, rates])
+            weights = np.concatenate([weights, np.ones(len(rates), dtype=weights.dtype)])
+        return QuantileSummary(values, weights, int(self.partition_error[mask].sum()))
+
+
+def get_quantile_sketches(df: pd.DataFrame) -> QuantileSketches:
+    """Return the engagement-rate quantile sketches for a loaded frame, building them on first use."""
+    return derived(df, "quantile_sketches", QuantileSketches)
@@ -0,0 +1,85 @@
+"""
+Row selections over the cached social media frame.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.social.identity import restore_user_ids
+from modules.social.storage import INTERNAL_COLUMNS
+
+
+class PostSelection:
+    """
+    Read-only view of a subset of rows of the cached base frame.
+
+    Holds the base frame and sorted row positions instead of a filtered copy.
+    Columns are gathered on demand, once per selection, and only the columns a
+    consumer asks for, so charts and KPIs never copy the whole frame.
+
+    Supports the small part of the DataFrame interface the pages use:
+    ``sel["col"]`` returns a Series, ``sel[["a", "b"]]`` a narrow DataFrame,
+    and ``sel[mask]`` a further sub-selection (which drops any attached cube).
+    """
+
+    def __init__(self, base: pd.DataFrame, positions: Optional[np.ndarray] = None, cube=None):
+        if positions is not None and len(positions) == len(base):
+            # Positions are sorted and unique, so a full-length selection is every row
+            positions = None
+        self.base = base
+        self.positions = positions
+        # CubeView with the same rows, when the filters that produced them are cube-answerable
+        self.cube = cube
+        # AggregateBundle of these rows, computed on first use by get_aggregates
+        self.aggregates = None
+        # QuantileSummary of the selected engagement rates, when sketches can answer for them
+        self.er_summary = None
+        # Distinctive keyword tables by dimension, filled by modules.social.keywords.get_keywords
+        self.keywords = {}
+        # Version token of the select_posts view these rows are (dataset version + filter spec); sub-selections have none
+        self.version_token = None
+        self._gathered = {}
+
+    def __len__(self) -> int:
+        return len(self.base) if self.positions is None else len(self.positions)
+
+    def __contains__(self, col) -> bool:
+        return col in self.base.columns
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.base.columns
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def row_positions(self) -> np.ndarray:
+        """Positions of the selected rows in the base frame."""
+        return np.arange(len(self.base)) if self.positions is None else self.positions
+
+    def _column(self, col: str) -> pd.Series:
+        if self.positions is None:
+            return self.base[col]
+        if col not in self._gathered:
+            self._gathered[col] = self.base[col].take(self.positions).reset_index(drop=True)
+        return self._gathered[col]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._column(key)
+        if isinstance(key, list):
+            return pd.DataFrame({col: self._column(col) for col in key}, copy=False)
+        mask = np.asarray(key, dtype=bool)
+        return PostSelection(self.base, self.row_positions()[mask])
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Materialize the selection as a standalone DataFrame for exports.
+
+        Has the original user_id and none of the INTERNAL_COLUMNS derived at load time.
+        """
+        columns = np.flatnonzero(~self.base.columns.isin(INTERNAL_COLUMNS))
+        rows = slice(None) if self.positions is None else self.positions
+        return restore_user_ids(self.base.iloc[rows, columns].reset_index(drop=True))
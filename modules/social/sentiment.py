@@ -0,0 +1,152 @@
+"""
+Lexicon sentiment scoring of post_text, batched and fanned out over a process pool.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from modules.social.derived import derived
+from modules.social.tokens import tokenize
+
+SENTIMENT_LABELS = ("Negative", "Neutral", "Positive")
+
+# Frame attribute set when post_sentiment was filled in from the lexicon (the source had no labels)
+LEXICON_LABELS_ATTR = "sentiment_from_lexicon"
+
+# Texts scored per batch; batches are the unit of work handed to pool workers
+SENTIMENT_CHUNK_ROWS = 50_000
+
+# Word polarity; texts are scored by the sum over their words
+POSITIVE_WORDS = (
+    "achieve", "benefit", "benefits", "better", "bright", "clean", "cleaner", "collective",
+    "democratize", "effective", "efficiency", "embrace", "embraced", "empower", "empowers",
+    "enable", "enables", "encourage", "engages", "ensure", "ensures", "essential", "excellent",
+    "future", "good", "great", "greener", "grow", "healthy", "hope", "improve", "improves",
+    "inspire", "inspires", "innovation", "opportunities", "opportunity", "preserve", "progress",
+    "promote", "promotes", "protect", "protecting", "protects", "resilience", "save", "secure",
+    "solution", "solutions", "strengthens", "success", "support", "thrive", "together", "well",
+)
+NEGATIVE_WORDS = (
+    "collapse", "combat", "crisis", "damage", "danger", "dangerous", "degradation", "destroy",
+    "destruction", "disaster", "emergency", "exploitation", "extinction", "fail", "failure",
+    "fear", "fights", "harm", "harmful", "lack", "loss", "lost", "pollution", "poor", "risk",
+    "risks", "scarcity", "severe", "threat", "threatens", "toxic", "urgent", "waste", "worse",
+    "worst",
+)
+
+_LEXICON = pd.Index(POSITIVE_WORDS + NEGATIVE_WORDS)
+_WEIGHTS = np.concatenate([np.ones(len(POSITIVE_WORDS)), -np.ones(len(NEGATIVE_WORDS))])
+
+
+def score_batch(texts: Sequence[str]) -> np.ndarray:
+    """
+    Lexicon score of each text: positive words count +1, negative words -1.
+
+    Args:
+        texts: Batch of texts (missing values score 0)
+
+    Returns:
+        Float array with one score per text
+    """
+    rows, tokens = tokenize(pd.Series(texts, dtype=object))
+    hits = _LEXICON.get_indexer(tokens)
+    found = hits >= 0
+    return np.bincount(rows[found], weights=_WEIGHTS[hits[found]], minlength=len(texts))
+
+
+def score_texts(texts: Sequence[str],
+                workers: Optional[int] = None,
+                chunksize: int = SENTIMENT_CHUNK_ROWS) -> np.ndarray:
+    """
+    Score texts in batches, across a process pool when there is more than one batch.
+
+    Args:
+        texts: Texts to score
+        workers: Pool size (defaults to the CPU count); 1 scores in-process
+        chunksize: Texts per batch
+
+    Returns:
+        Float array with one score per text, in input order
+    """
+    texts = list(texts)
+    batches = [texts[start:start + chunksize] for start in range(0, len(texts), chunksize)]
+    workers = min(workers or os.cpu_count() or 1, len(batches))
+    if workers <= 1:
+        return np.concatenate([score_batch(batch) for batch in batches]) if batches else np.zeros(0)
+    try:
+        # Spawned, not forked: the Streamlit server is multithreaded, and a forked
+        # child can inherit locks other threads held at the time of the fork
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            return np.concatenate(list(pool.map(score_batch, batches)))
+    except OSError:
+        # Sandboxed deployments without process spawning still score, serially
+        return np.concatenate([score_batch(batch) for batch in batches])
+
+
+def label_scores(scores: np.ndarray) -> np.ndarray:
+    """Codes into SENTIMENT_LABELS: 0 for a negative score, 1 for zero, 2 for positive."""
+    return (np.sign(scores) + 1).astype(np.int8)
+
+
+def lexicon_labels(texts: pd.Series) -> np.ndarray:
+    """Lexicon label of each text, as an object array of SENTIMENT_LABELS (one batch, in-process)."""
+    codes = label_scores(score_batch(texts.to_numpy(dtype=object, na_value=None)))
+    return np.asarray(SENTIMENT_LABELS, dtype=object)[codes]
+
+
+class LexiconSentiment:
+    """Lexicon scores and labels of every post of one loaded frame."""
+
+    def __init__(self, df: pd.DataFrame, workers: Optional[int] = None):
+        texts = df["post_text"] if "post_text" in df.columns else pd.Series([None] * len(df), dtype=object)
+        self.scores = score_texts(texts.to_numpy(dtype=object, na_value=None), workers=workers).astype(np.float32)
+        self.codes = label_scores(self.scores)
+
+    @property
+    def nbytes(self) -> int:
+        return self.scores.nbytes + self.codes.nbytes
+
+    def labels(self) -> pd.Categorical:
+        """Lexicon label of every post."""
+        return pd.Categorical.from_codes(self.codes, categories=list(SENTIMENT_LABELS))
+
+
+def get_lexicon_sentiment(df: pd.DataFrame) -> LexiconSentiment:
+    """Return the lexicon scores for a loaded frame, scoring it on first use."""
+    return derived(df, "lexicon_sentiment", LexiconSentiment)
+
+
+def sentiment_agreement(df) -> Optional[pd.DataFrame]:
+    """
+    Cross-tabulate the lexicon labels against post_sentiment.
+
+    Args:
+        df: Loaded DataFrame or a PostSelection over one
+
+    Returns:
+        DataFrame of post counts indexed by post_sentiment with one column per
+        lexicon label, or None without both text and labels (or when the labels
+        are the lexicon's own)
+    """
+    base = getattr(df, "base", df)
+    if "post_text" not in base.columns or "post_sentiment" not in base.columns or base.attrs.get(LEXICON_LABELS_ATTR):
+        return None
+    codes = get_lexicon_sentiment(base).codes
+    positions = getattr(df, "positions", None)
+    if positions is not None:
+        codes = codes[positions]
+    labelled = pd.Categorical(df["post_sentiment"], categories=list(SENTIMENT_LABELS)).codes
+    valid = labelled >= 0
+    counts = np.bincount(
+        labelled[valid].astype(np.int64) * len(SENTIMENT_LABELS) + codes[valid],
+        minlength=len(SENTIMENT_LABELS) ** 2,
+    )
+    return pd.DataFrame(
+        counts.reshape(len(SENTIMENT_LABELS), -1),
+        index=pd.Index(SENTIMENT_LABELS, name="post_sentiment"),
+        columns=pd.Index(SENTIMENT_LABELS, name="lexicon"),
+    )
@@ -0,0 +1,209 @@
+"""
+Mergeable heavy-hitter sketches for approximate top-k hashtags, topics and CTAs.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.social.aggregates import AggregateBundle, TABLE_DIMENSIONS, compute_aggregates, measure_table
+from modules.social.cube import CUBE_MEASURES, cell_measures, get_dimension_codes, get_post_dates
+from modules.social.derived import derived
+
+# Dimensions answered approximately in top-k mode
+SKETCH_DIMENSIONS = ("hashtag", "climate_topic", "call_to_action")
+
+# Counters kept per day partition; charts show at most 20 values
+SKETCH_CAPACITY = 64
+
+# Sums carried alongside each counter so tables have the columns of exact ones
+_SKETCH_SUMS = tuple(name for name in CUBE_MEASURES if name != "posts")
+
+
+def _group(codes: np.ndarray, weights: dict):
+    """Sum weights per distinct code; returns the sorted codes and the summed arrays."""
+    uniques, inverse = np.unique(codes, return_inverse=True)
+    return uniques, {name: np.bincount(inverse, weights=values, minlength=len(uniques)) for name, values in weights.items()}
+
+
+class HeavyHitters:
+    """
+    Space-Saving style summary of the most frequent values of one dimension.
+
+    Each tracked value has a guaranteed post count ``posts`` and an ``error``:
+    its true count lies in ``[posts, posts + error]``. Any value not tracked
+    has at most ``untracked_max`` posts. The other measure sums cover the
+    same posts as ``posts``, so they are estimates when ``error`` > 0.
+    """
+
+    def __init__(self, codes: np.ndarray, posts: np.ndarray, sums: dict, error: np.ndarray, untracked_max: float):
+        self.codes = codes
+        self.posts = posts
+        self.sums = sums
+        self.error = error
+        self.untracked_max = untracked_max
+
+    @property
+    def max_error(self) -> float:
+        return float(self.error.max()) if len(self.error) else 0.0
+
+    def table(self, dim: str, labels: pd.Index) -> pd.DataFrame:
+        """Tracked values in label order, with the columns of an AggregateBundle table plus ``error``."""
+        order = np.argsort(self.codes, kind="stable")
+        table = measure_table(dim, labels.take(self.codes[order]), {
+            "posts": self.posts[order],
+            **{name: values[order] for name, values in self.sums.items()},
+        })
+        table["error"] = self.error[order].astype(np.int64)
+        return table
+
+
+class DaySketches:
+    """
+    Per-day heavy-hitter summaries of the sketched dimensions of one loaded frame.
+
+    Each day keeps its ``capacity`` most frequent values with exact counts and
+    the count of the largest value it dropped. Summaries of a date range merge
+    by summing counters, so a top-k query reads at most ``days x capacity``
+    entries whatever the number of distinct values.
+    """
+
+    def __init__(self, df: pd.DataFrame, capacity: int = SKETCH_CAPACITY):
+        self.capacity = capacity
+        encoded = get_dimension_codes(df)
+        self.days = encoded["post_day"][1] if "post_day" in encoded else pd.DatetimeIndex([])
+        day_codes = encoded["post_day"][0] if "post_day" in encoded else np.full(len(df), -1)
+        measures = cell_measures(df)
+        # Whole days come from the counters, posts of partly covered days from their rows
+        self.dates = get_post_dates(df)
+
+        self.labels = {}
+        self.partitions = {}
+        for dim in SKETCH_DIMENSIONS:
+            if dim in encoded:
+                value_codes, self.labels[dim] = encoded[dim]
+                self.partitions[dim] = self._build(day_codes, value_codes, measures)
+
+    def _build(self, day_codes: np.ndarray, value_codes: np.ndarray, measures: dict) -> dict:
+        """Truncated per-day counters stored day-contiguously, with offsets per day."""
+        valid = (day_codes >= 0) & (value_codes >= 0)
+        n_values = int(value_codes.max()) + 1 if valid.any() else 1
+        keys, sums = _group(
+            day_codes[valid].astype(np.int64) * n_values + value_codes[valid],
+            {name: values[valid] for name, values in measures.items()},
+        )
+        days, codes = np.divmod(keys, n_values)
+
+        # Most frequent first within each day, then rank within the day
+        order = np.lexsort((-sums["posts"], days))
+        days, codes = days[order], codes[order]
+        sums = {name: values[order] for name, values in sums.items()}
+        starts = np.searchsorted(days, np.arange(len(self.days) + 1))
+        rank = np.arange(len(days)) - starts[days]
+
+        floors = np.zeros(len(self.days))
+        dropped = rank == self.capacity
+        floors[days[dropped]] = sums["posts"][dropped]
+
+        kept = rank < self.capacity
+        return {
+            "offsets": np.searchsorted(days[kept], np.arange(len(self.days) + 1)),
+            "codes": codes[kept],
+            "floors": floors,
+            **{name: values[kept] for name, values in sums.items()},
+        }
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for part in self.partitions.values() for values in part.values())
+
+    def day_span(self, date_range: Optional[tuple]) -> tuple:
+        """
+        Day partitions [lo, hi) an inclusive post_date range covers completely,
+        and the sorted rows of its other posts (in days it covers only partly).
+        """
+        if not date_range:
+            return 0, len(self.days), np.empty(0, dtype=np.int64)
+        return self.dates.split(date_range)
+
+    def top(self, dim: str, lo: int, hi: int, exact: Optional[tuple] = None) -> HeavyHitters:
+        """
+        Merge the summaries of days [lo, hi) into one summary of at most ``capacity`` values.
+
+        Args:
+            dim: One of SKETCH_DIMENSIONS
+            lo: First day partition
+            hi: One past the last day partition
+            exact: Optional (value codes, measures) of single posts counted exactly
+                on top of the days, e.g. the posts of partly covered days
+
+        Returns:
+            HeavyHitters over the range
+        """
+        part = self.partitions[dim]
+        first, last = part["offsets"][lo], part["offsets"][hi]
+        floors = part["floors"]
+        day_of_entry = np.repeat(np.arange(lo, hi), np.diff(part["offsets"][lo:hi + 1]))
+        entries = {
+            "posts": part["posts"][first:last],
+            "covered": floors[day_of_entry],
+            **{name: part[name][first:last] for name in _SKETCH_SUMS},
+        }
+        entry_codes = part["codes"][first:last]
+        if exact is not None:
+            # Exact posts drop nothing, so they add no floor (and no cover)
+            exact_codes, measures = exact
+            keep = exact_codes >= 0
+            entry_codes = np.concatenate([entry_codes, exact_codes[keep]])
+            extra = {"posts": np.ones(int(keep.sum())), "covered": np.zeros(int(keep.sum()))}
+            extra.update({name: measures[name][keep] for name in _SKETCH_SUMS})
+            entries = {name: np.concatenate([values, extra[name]]) for name, values in entries.items()}
+        codes, sums = _group(entry_codes, entries)
+        # A value missed a day's counters only if it had at most that day's floor
+        total_floor = float(floors[lo:hi].sum())
+        error = total_floor - sums["covered"]
+
+        if len(codes) > self.capacity:
+            upper = sums["posts"] + error
+            keep = np.argsort(-sums["posts"], kind="stable")[:self.capacity]
+            dropped = np.ones(len(codes), dtype=bool)
+            dropped[keep] = False
+            total_floor = max(total_floor, float(upper[dropped].max()))
+            codes, error = codes[keep], error[keep]
+            sums = {name: values[keep] for name, values in sums.items()}
+
+        return HeavyHitters(codes, sums["posts"], {name: sums[name] for name in _SKETCH_SUMS}, error, total_floor)
+
+
+def get_day_sketches(df: pd.DataFrame) -> DaySketches:
+    """Return the per-day sketches for a loaded frame, building them on first use."""
+    return derived(df, "day_sketches", DaySketches)
+
+
+def approximate_aggregates(selection, date_range: Optional[tuple] = None) -> AggregateBundle:
+    """
+    AggregateBundle whose hashtag, topic and CTA tables come from the day sketches.
+
+    Only valid for selections filtered by date alone; the other tables are exact.
+
+    Args:
+        selection: PostSelection over a loaded frame
+        date_range: Tuple of (start_date, end_date) the selection was filtered by
+
+    Returns:
+        AggregateBundle with ``approximate`` holding the error bounds per sketched dimension
+    """
+    sketches = get_day_sketches(selection.base)
+    bundle = compute_aggregates(selection, dimensions=[dim for dim in TABLE_DIMENSIONS if dim not in sketches.partitions])
+    lo, hi, partial = sketches.day_span(date_range)
+    exact = None
+    if len(partial):
+        encoded = get_dimension_codes(selection.base)
+        measures = cell_measures(selection.base, partial)
+    for dim, labels in sketches.labels.items():
+        if len(partial):
+            exact = (encoded[dim][0][partial], measures)
+        hitters = sketches.top(dim, lo, hi, exact)
+        bundle.tables[dim] = hitters.table(dim, labels)
+        bundle.approximate[dim] = {"max_error": hitters.max_error, "untracked_max": hitters.untracked_max}
+    return bundle
@@ -0,0 +1,658 @@
+"""
+Loading, preprocessing and on-disk snapshots for the social media dataset.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from modules.caching import is_stamped, stamp_version
+from modules.social.accumulators import KPI_ATTR, KPIAccumulator
+from modules.social.geography import LOCATION_COLUMNS, parse_locations
+from modules.social.identity import USER_ID_COLUMNS, encode_user_ids
+from modules.social.sentiment import LEXICON_LABELS_ATTR, lexicon_labels
+
+try:
+    import pyarrow  # noqa: F401  (Parquet engine used for snapshots)
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+# Frame attribute carrying the per-column memory usage before and after the compact schema
+MEMORY_ATTR = "memory_usage"
+
+# Frame attribute naming the snapshot a loaded frame was read from or saved as (source prefix and fingerprint)
+SNAPSHOT_ATTR = "snapshot_name"
+
+# Rows between the samples measured for the memory usage of text columns
+USAGE_SAMPLE_STEP = 16
+
+# Snapshots live next to the transport downloads in the root-level 'data' directory
+SNAPSHOT_DIR = Path(
+    os.environ.get("SOCIAL_SNAPSHOT_DIR", Path(__file__).parent.parent.parent / "data" / "snapshots")
+)
+
+# Uploaded CSVs are spooled here under their content hash, so identical uploads
+# from any session share one file (and so one snapshot and one registry entry)
+UPLOAD_DIR = Path(
+    os.environ.get("SOCIAL_UPLOAD_DIR", Path(__file__).parent.parent.parent / "data" / "uploads")
+)
+
+# Bump whenever preprocess_posts changes so old snapshots are not reused
+SNAPSHOT_VERSION = 13
+
+_HASH_CHUNK_BYTES = 1 << 20
+
+# Rows parsed per CSV chunk; bounds peak memory of the ingest independently of file size
+CSV_CHUNK_ROWS = 100_000
+
+# Appended tails are stored as extra snapshot parts until there are this many
+MAX_SNAPSHOT_PARTS = 8
+
+# Declared schema of the processed frame: low-cardinality text columns become
+# categoricals, engagement counts the smallest integer type that holds them
+CATEGORICAL_COLUMNS = [
+    "platform",
+    "post_sentiment",
+    "climate_topic",
+    "hashtag",
+    "call_to_action",
+    "user_location",
+    *LOCATION_COLUMNS,
+    "username",
+    "user_id",
+]
+COUNT_COLUMNS = [
+    "engagement_likes",
+    "engagement_shares",
+    "engagement_comments",
+    "user_followers",
+    "engagement_total",
+]
+
+# Columns preprocess_posts derives for the indexes and charts; exports leave them out
+INTERNAL_COLUMNS = ["post_day", "post_hour", *LOCATION_COLUMNS]
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Above this distinct/rows ratio a categorical costs more than it saves
+MAX_CATEGORY_RATIO = 0.5
+
+
+def preprocess_posts(df: pd.DataFrame, compact: bool = True) -> pd.DataFrame:
+    """
+    Derive engagement metrics and normalize columns of raw social media posts.
+
+    Args:
+        df: Raw DataFrame as read from the CSV
+        compact: Whether to convert the result to the declared compact schema
+
+    Returns:
+        Processed DataFrame with engagement metrics and normalized columns
+    """
+    # Normalize numeric columns
+    numeric_cols = [
+        "engagement_likes",
+        "engagement_shares",
+        "engagement_comments",
+        "user_followers",
+    ]
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    # Create engagement metrics
+    df["engagement_total"] = (
+        df.get("engagement_likes", 0).fillna(0)
+        + df.get("engagement_shares", 0).fillna(0)
+        + df.get("engagement_comments", 0).fillna(0)
+    )
+    df["engagement_rate"] = np.where(
+        df.get("user_followers", 0).fillna(0) > 0,
+        df["engagement_total"] / df["user_followers"],
+        np.nan,
+    )
+
+    # Create normalized date fields
+    if "post_date" in df.columns:
+        df["post_date"] = pd.to_datetime(df["post_date"], errors="coerce")
+        df["post_month"] = df["post_date"].dt.to_period("M").dt.to_timestamp()
+        df["post_day"] = df["post_date"].dt.normalize()
+        df["post_hour"] = df["post_date"].dt.hour.astype("Int8")
+
+    # Store UUID user ids as two 64-bit integers; ids that are not UUIDs stay in user_id
+    if "user_id" in df.columns:
+        hi, lo, residual = encode_user_ids(df["user_id"])
+        position = df.columns.get_loc("user_id")
+        df["user_id"] = residual.set_axis(df.index)
+        df.insert(position, USER_ID_COLUMNS[1], lo)
+        df.insert(position, USER_ID_COLUMNS[0], hi)
+
+    # Split user_location into city and country, parsing each distinct value once
+    if "user_location" in df.columns:
+        df[LOCATION_COLUMNS[0]], df[LOCATION_COLUMNS[1]] = parse_locations(df["user_location"])
+
+    # Exports without sentiment labels get the lexicon label of their post_text
+    if "post_sentiment" not in df.columns and "post_text" in df.columns:
+        df["post_sentiment"] = lexicon_labels(df["post_text"])
+
+    # Normalize hashtag (remove nulls, lowercase)
+    if "hashtag" in df.columns:
+        df["hashtag"] = df["hashtag"].astype(str).str.strip().str.lower()
+
+    # Normalize categorical columns
+    for c in ["post_sentiment", "climate_topic", "platform"]:
+        if c in df.columns:
+            df[c] = df[c].astype(str)
+
+    return apply_schema(df) if compact else df
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a processed frame to the compact declared schema.
+
+    Args:
+        df: Processed DataFrame
+
+    Returns:
+        The same DataFrame with categorical text columns and downcast counts,
+        without the residual user_id column when every id was a UUID
+    """
+    if "user_id" in df.columns and USER_ID_COLUMNS[0] in df.columns and df["user_id"].isna().all():
+        del df["user_id"]
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            if df[col].nunique(dropna=True) <= MAX_CATEGORY_RATIO * max(len(df), 1):
+                df[col] = df[col].astype("category")
+
+    for col in COUNT_COLUMNS:
+        if col in df.columns:
+            # Only integral, non-null columns downcast; anything else keeps its dtype
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+
+    return df
+
+
+def column_usage(df: pd.DataFrame, step: int = USAGE_SAMPLE_STEP) -> dict:
+    """
+    Dtype and deep memory usage in bytes of every column, as a JSON-safe dict.
+
+    Python string columns are measured on every ``step``-th row and scaled up,
+    since sizing each object costs a good share of the parse itself.
+    """
+    usage = df.memory_usage(index=False, deep=False).astype(np.float64)
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+            sample = series.iloc[::step]
+            usage[col] = sample.memory_usage(index=False, deep=True) * len(series) / max(len(sample), 1)
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            usage[col] = series.memory_usage(index=False, deep=True)
+    return {col: [str(df[col].dtype), int(usage[col])] for col in df.columns}
+
+
+def _merge_usage(total: dict, usage: dict) -> dict:
+    """Add the column bytes of ``usage`` to ``total``; a column keeps its first dtype."""
+    merged = {col: list(entry) for col, entry in total.items()}
+    for col, (dtype, nbytes) in usage.items():
+        merged.setdefault(col, [dtype, 0])[1] += nbytes
+    return merged
+
+
+def memory_report(before: dict, after: dict) -> pd.DataFrame:
+    """
+    Compare per-column memory usage of two versions of the same frame.
+
+    Args:
+        before: column_usage of the frame before the schema was applied
+        after: column_usage of the frame after the schema was applied
+
+    Returns:
+        DataFrame indexed by column with dtypes, bytes before/after and the saving ratio
+    """
+    report = pd.DataFrame({
+        "dtype_before": pd.Series({col: dtype for col, (dtype, _) in before.items()}, dtype=object),
+        "bytes_before": pd.Series({col: nbytes for col, (_, nbytes) in before.items()}, dtype=np.float64),
+        "dtype_after": pd.Series({col: dtype for col, (dtype, _) in after.items()}, dtype=object),
+        "bytes_after": pd.Series({col: nbytes for col, (_, nbytes) in after.items()}, dtype=np.float64),
+    })
+    report.loc["TOTAL", ["bytes_before", "bytes_after"]] = [
+        report["bytes_before"].sum(),
+        report["bytes_after"].sum(),
+    ]
+    report["ratio"] = report["bytes_before"] / report["bytes_after"]
+    return report
+
+
+def frame_memory_report(df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """Memory report recorded when a loaded frame was ingested, or None for other frames."""
+    usage = df.attrs.get(MEMORY_ATTR)
+    if not usage:
+        return None
+    return memory_report(usage["before"], usage["after"])
+
+
+def _compact_chunk(chunk: pd.DataFrame,
+                   accumulator: Optional[KPIAccumulator] = None,
+                   usage: Optional[list] = None) -> pd.DataFrame:
+    """Preprocess one CSV chunk, fold it into the KPI accumulator, and shrink it until the final combine."""
+    chunk = preprocess_posts(chunk, compact=False)
+    if accumulator is not None:
+        accumulator.update(chunk)
+    if usage is not None:
+        usage.append(column_usage(chunk))
+    for col in CATEGORICAL_COLUMNS:
+        if col in chunk.columns:
+            chunk[col] = chunk[col].astype("category")
+    for col in COUNT_COLUMNS:
+        if col in chunk.columns:
+            chunk[col] = pd.to_numeric(chunk[col], downcast="integer")
+    return chunk
+
+
+def _combine_chunks(parts: list) -> pd.DataFrame:
+    """
+    Concatenate compact chunks column by column into the final frame.
+
+    Each column is released from the chunks as soon as it has been combined,
+    so the transient overhead is one column rather than a second full frame.
+    """
+    columns = {}
+    names = list(dict.fromkeys(col for part in parts for col in part.columns))
+    for col in names:
+        # A column only some parts kept (e.g. the residual user_id) is missing in the others
+        dtype = next(part[col].dtype for part in parts if col in part.columns)
+        pieces = [
+            part.pop(col) if col in part.columns else pd.Series(None, index=part.index, dtype=dtype, name=col)
+            for part in parts
+        ]
+        if all(isinstance(piece.dtype, pd.CategoricalDtype) for piece in pieces):
+            # Chunks carry different category sets; union recodes them onto one.
+            # Chunks that already share one category list keep its order.
+            same = all(piece.cat.categories.equals(pieces[0].cat.categories) for piece in pieces)
+            columns[col] = pd.Series(union_categoricals(pieces, sort_categories=not same), name=col)
+        else:
+            columns[col] = pd.concat(pieces, ignore_index=True)
+        del pieces
+
+    df = pd.DataFrame(columns)
+    for col in CATEGORICAL_COLUMNS:
+        if col not in df.columns or not isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        if len(df[col].cat.categories) > MAX_CATEGORY_RATIO * max(len(df), 1):
+            df[col] = df[col].astype(str).where(df[col].notna())
+    return apply_schema(df)
+
+
+def read_posts_csv(source,
+                   chunksize: int = CSV_CHUNK_ROWS,
+                   accumulator: Optional[KPIAccumulator] = None,
+                   progress: Optional[Callable[[float], None]] = None,
+                   usage: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Parse and preprocess a social media CSV from a path or file-like object.
+
+    The CSV is streamed in bounded chunks; derived engagement and date columns
+    are computed per chunk and only the compact result of each chunk is kept.
+
+    Args:
+        source: Path or file-like object with the CSV
+        chunksize: Rows parsed per chunk
+        accumulator: Optional KPIAccumulator updated with every chunk
+        progress: Optional callback receiving the fraction of bytes parsed after each chunk
+        usage: Optional dict receiving the column_usage of the rows ``before`` and
+            ``after`` the compact schema (for memory_report)
+
+    Returns:
+        Processed DataFrame in the compact declared schema
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fh:
+            return read_posts_csv(fh, chunksize=chunksize, accumulator=accumulator, progress=progress, usage=usage)
+
+    start = total = None
+    if progress is not None and source.seekable():
+        start = source.tell()
+        total = source.seek(0, os.SEEK_END) - start
+        source.seek(start)
+
+    reader = pd.read_csv(
+        source,
+        parse_dates=["post_date"],
+        encoding="utf-8",
+        chunksize=chunksize,
+    )
+    parts = []
+    chunk_usage = [] if usage is not None else None
+    for chunk in reader:
+        parts.append(_compact_chunk(chunk, accumulator, chunk_usage))
+        if total:
+            progress(min((source.tell() - start) / total, 1.0))
+    df = _combine_chunks(parts)
+    if usage is not None:
+        before = {}
+        for entry in chunk_usage:
+            before = _merge_usage(before, entry)
+        usage["before"], usage["after"] = before, column_usage(df)
+    return df
+
+
+def spool_upload(fileobj) -> Path:
+    """
+    Copy an uploaded file to UPLOAD_DIR in chunks, named by its content hash.
+
+    The hash is computed while the bytes stream to disk, so the upload is never
+    copied whole in memory. Identical uploads map to the same file, which is
+    left untouched (same mtime) so its snapshot stays valid.
+
+    Args:
+        fileobj: Readable binary file-like object (e.g. a Streamlit UploadedFile)
+
+    Returns:
+        Path of the spooled CSV
+    """
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.blake2b(digest_size=16)
+    tmp_path = UPLOAD_DIR / f"upload.{os.getpid()}.{threading.get_ident()}.tmp"
+    fileobj.seek(0)
+    with open(tmp_path, "wb") as out:
+        for block in iter(lambda: fileobj.read(_HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+            out.write(block)
+
+    path = UPLOAD_DIR / f"{digest.hexdigest()}.csv"
+    if path.exists():
+        tmp_path.unlink()
+    else:
+        os.replace(tmp_path, path)
+    return path
+
+
+def _hash_source(csv_path: str, size: int, checkpoint: Optional[int] = None) -> Tuple[str, Optional[str]]:
+    """
+    Hash the first ``size`` bytes of a file in one streaming pass.
+
+    Args:
+        csv_path: Path to the source file
+        size: Number of bytes to hash (the size observed by ``os.stat``)
+        checkpoint: Optional byte offset whose prefix hash is also returned
+
+    Returns:
+        Tuple of (content hash, hash of the first ``checkpoint`` bytes or None)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    prefix_digest = None
+    remaining = size
+    with open(csv_path, "rb") as fh:
+        if checkpoint is not None and checkpoint <= size:
+            # blake2b can be forked mid-stream, so the prefix hash costs no extra read
+            for block in iter(lambda: fh.read(min(_HASH_CHUNK_BYTES, checkpoint - (size - remaining))), b""):
+                digest.update(block)
+                remaining -= len(block)
+            prefix_digest = digest.copy().hexdigest()
+        for block in iter(lambda: fh.read(min(_HASH_CHUNK_BYTES, remaining)), b""):
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest(), prefix_digest
+
+
+def _fingerprint(stat: os.stat_result, content_hash: str) -> str:
+    """Combine file size, mtime and content hash into a single fingerprint."""
+    key = f"v{SNAPSHOT_VERSION}:{stat.st_size}:{stat.st_mtime_ns}:{content_hash}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def _snapshot_prefix(csv_path: str) -> str:
+    """Stable per-source prefix so different files with the same name never collide."""
+    resolved = str(Path(csv_path).resolve())
+    path_key = hashlib.blake2b(resolved.encode(), digest_size=4).hexdigest()
+    return f"{Path(csv_path).stem}-{path_key}"
+
+
+def _manifest_path(csv_path: str) -> Path:
+    """Location of the JSON manifest describing the current snapshot of a source."""
+    return SNAPSHOT_DIR / f"{_snapshot_prefix(csv_path)}.json"
+
+
+def _read_manifest(csv_path: str) -> Optional[dict]:
+    """Manifest of the last ingest of this source, or None if missing or from another version."""
+    try:
+        manifest = json.loads(_manifest_path(csv_path).read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        return None
+    return manifest
+
+
+def _atomic_write(path: Path, write) -> None:
+    """Write through a temporary file so readers never see a partial snapshot."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _read_parts(manifest: dict) -> Optional[pd.DataFrame]:
+    """Load and combine the snapshot parts listed in a manifest."""
+    try:
+        frames = [pd.read_parquet(SNAPSHOT_DIR / name) for name in manifest["parts"]]
+    except Exception:
+        # A missing or truncated part is just a cache miss
+        return None
+    df = frames[0] if len(frames) == 1 else _combine_chunks(frames)
+    if len(df) != manifest["rows"]:
+        return None
+    return df
+
+
+def _array_path(df: pd.DataFrame, kind: str) -> Optional[Path]:
+    """File of a per-snapshot array of a loaded frame, or None for frames that are not the loaded one."""
+    name = df.attrs.get(SNAPSHOT_ATTR)
+    if name is None or not is_stamped(df):
+        return None
+    return SNAPSHOT_DIR / f"{name}.{kind}.npy"
+
+
+def load_snapshot_array(df: pd.DataFrame, kind: str) -> Optional[np.ndarray]:
+    """
+    Per-row array derived from a loaded frame and saved beside its snapshot.
+
+    Args:
+        df: Frame returned by load_posts
+        kind: Name of the array (e.g. "clusters")
+
+    Returns:
+        The array, or None when it was never saved for this snapshot
+    """
+    path = _array_path(df, kind)
+    if path is None:
+        return None
+    try:
+        values = np.load(path)
+    except (OSError, ValueError):
+        return None
+    return values if len(values) == len(df) else None
+
+
+def save_snapshot_array(df: pd.DataFrame, kind: str, values: np.ndarray) -> None:
+    """
+    Save a per-row array derived from a loaded frame beside its snapshot.
+
+    The file is named after the snapshot fingerprint, so other processes load
+    it for the same source state and _save_snapshot removes it once the source changes.
+    """
+    path = _array_path(df, kind)
+    if path is None:
+        return
+
+    def write(tmp):
+        with open(tmp, "wb") as fh:
+            np.save(fh, values)
+
+    try:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, write)
+    except OSError:
+        # Read-only deployments recompute it in every process
+        return
+
+
+def _save_snapshot(
+    csv_path: str, manifest: dict, df: pd.DataFrame, new_part: Optional[pd.DataFrame]
+) -> None:
+    """
+    Write ``new_part`` as a snapshot part and commit the manifest describing ``df``.
+
+    When the part list grows past MAX_SNAPSHOT_PARTS the whole frame is written
+    as a single part instead. Without a new part only the manifest is updated.
+    Stale parts of the same source, and arrays saved by save_snapshot_array
+    for an earlier fingerprint, are removed.
+    """
+    if not HAS_PARQUET:
+        return
+    parts = list(manifest["parts"])
+    if new_part is not None and len(parts) + 1 > MAX_SNAPSHOT_PARTS:
+        parts, new_part = [], df
+    try:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        if new_part is not None:
+            name = f"{_snapshot_prefix(csv_path)}-{manifest['fingerprint']}.parquet"
+            _atomic_write(SNAPSHOT_DIR / name, lambda tmp: new_part.to_parquet(tmp, index=False))
+            parts.append(name)
+        manifest = {**manifest, "parts": parts}
+        _atomic_write(_manifest_path(csv_path), lambda tmp: tmp.write_text(json.dumps(manifest)))
+    except OSError:
+        # Read-only deployments still work, they just re-parse on restart
+        return
+
+    for stale in SNAPSHOT_DIR.glob(f"{_snapshot_prefix(csv_path)}-*.parquet"):
+        if stale.name not in manifest["parts"]:
+            stale.unlink(missing_ok=True)
+    current = f"{_snapshot_prefix(csv_path)}-{manifest['fingerprint']}."
+    for stale in SNAPSHOT_DIR.glob(f"{_snapshot_prefix(csv_path)}-*.npy"):
+        if not stale.name.startswith(current):
+            stale.unlink(missing_ok=True)
+
+
+def _ends_with_newline(csv_path: str, size: int) -> bool:
+    """Whether the ingested bytes end on a row boundary, so appends start a fresh row."""
+    if size == 0:
+        return False
+    with open(csv_path, "rb") as fh:
+        fh.seek(size - 1)
+        return fh.read(1) == b"\n"
+
+
+def _read_tail(csv_path: str,
+               start: int,
+               end: int,
+               accumulator: KPIAccumulator,
+               progress: Optional[Callable[[float], None]] = None,
+               usage: Optional[dict] = None) -> Optional[pd.DataFrame]:
+    """Parse the rows appended between byte offsets ``start`` and ``end``."""
+    with open(csv_path, "rb") as fh:
+        header = fh.readline()
+        fh.seek(start)
+        tail = fh.read(end - start)
+    if not tail.strip():
+        return None
+    return read_posts_csv(io.BytesIO(header + tail), accumulator=accumulator, progress=progress, usage=usage)
+
+
+def _load_or_ingest(csv_path: str,
+                    progress: Optional[Callable[[float], None]] = None) -> Tuple[pd.DataFrame, str, KPIAccumulator, dict]:
+    """
+    Serve the processed frame from the snapshot, the appended tail, or a full parse.
+
+    The manifest keeps the KPI accumulator and memory usage of the ingested rows;
+    an appended tail only accumulates its own rows and is merged into them.
+    """
+    stat = os.stat(csv_path)
+    manifest = _read_manifest(csv_path) if HAS_PARQUET else None
+    checkpoint = manifest["size"] if manifest else None
+    content_hash, prefix_hash = _hash_source(csv_path, stat.st_size, checkpoint)
+    fingerprint = _fingerprint(stat, content_hash)
+    current = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": fingerprint,
+        "content_hash": content_hash,
+        "size": stat.st_size,
+        "ends_with_newline": _ends_with_newline(csv_path, stat.st_size),
+    }
+
+    if manifest is not None:
+        if manifest["fingerprint"] == fingerprint:
+            df = _read_parts(manifest)
+            if df is not None:
+                return df, fingerprint, KPIAccumulator.from_dict(manifest["kpis"]), manifest["memory"]
+        elif prefix_hash == manifest["content_hash"] and manifest["ends_with_newline"]:
+            base = _read_parts(manifest)
+            if base is not None:
+                accumulator = KPIAccumulator()
+                usage = {}
+                tail = _read_tail(csv_path, manifest["size"], stat.st_size, accumulator, progress, usage)
+                df = base if tail is None else _combine_chunks([base, tail.copy(deep=False)])
+                memory = manifest["memory"] if tail is None else {
+                    "before": _merge_usage(manifest["memory"]["before"], usage["before"]),
+                    "after": column_usage(df),
+                }
+                accumulator.merge(KPIAccumulator.from_dict(manifest["kpis"]))
+                _save_snapshot(
+                    csv_path,
+                    {**current, "rows": len(df), "parts": manifest["parts"], "kpis": accumulator.to_dict(),
+                     "memory": memory},
+                    df,
+                    tail,
+                )
+                return df, fingerprint, accumulator, memory
+
+    accumulator = KPIAccumulator()
+    memory = {}
+    df = read_posts_csv(csv_path, accumulator=accumulator, progress=progress, usage=memory)
+    _save_snapshot(
+        csv_path,
+        {**current, "rows": len(df), "parts": [], "kpis": accumulator.to_dict(), "memory": memory},
+        df,
+        df,
+    )
+    return df, fingerprint, accumulator, memory
+
+
+def load_posts(csv_path: str, progress: Optional[Callable[[float], None]] = None) -> pd.DataFrame:
+    """
+    Load the processed social media frame, preferring an up-to-date snapshot.
+
+    The snapshot manifest remembers the byte offset and row count of the last
+    ingest. If the file has only grown since then (its old bytes hash the same),
+    only the appended tail is parsed and merged; any other change rebuilds.
+
+    Args:
+        csv_path: Path to the CSV file
+        progress: Optional callback receiving the fraction of bytes parsed, when parsing
+
+    Returns:
+        Processed DataFrame, read from the snapshot when the source is unchanged.
+        Its version token (see modules.caching.version_token) is the source fingerprint and
+        ``attrs["kpi_accumulator"]`` the KPI accumulator of all its rows and
+        ``attrs["memory_usage"]`` their column usage before and after the
+        compact schema (see frame_memory_report). When the CSV has no
+        post_sentiment column it is filled from the post_text lexicon and
+        ``attrs["sentiment_from_lexicon"]`` is True. ``attrs["snapshot_name"]``
+        names the snapshot, for arrays saved with save_snapshot_array.
+    """
+    df, fingerprint, accumulator, memory = _load_or_ingest(csv_path, progress)
+    df.attrs[KPI_ATTR] = accumulator.to_dict()
+    df.attrs[MEMORY_ATTR] = memory
+    df.attrs[LEXICON_LABELS_ATTR] = "post_sentiment" not in pd.read_csv(csv_path, nrows=0).columns
+    if HAS_PARQUET:
+        df.attrs[SNAPSHOT_ATTR] = f"{_snapshot_prefix(csv_path)}-{fingerprint}"
+    return stamp_version(df, fingerprint)
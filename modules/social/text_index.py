@@ -0,0 +1,78 @@
+"""
+Token inverted index over post_text for full-text search.
+"""
+import numpy as np
+import pandas as pd
+
+from modules.social.derived import derived
+from modules.social.tokens import query_terms, tokenize
+
+# Sorts after every character, so [term, term + _MAX_CHAR) spans the words starting with term
+_MAX_CHAR = "\U0010ffff"
+
+
+class TextIndex:
+    """
+    Sorted vocabulary of post_text with the rows containing each word.
+
+    Postings are stored token-major in one array (CSR layout), so the rows of
+    every word sharing a prefix form a single contiguous slice. A query of n
+    terms costs n binary searches over the vocabulary plus the merge of the
+    matching postings, independent of how long the texts are.
+    """
+
+    def __init__(self, df: pd.DataFrame, column: str = "post_text"):
+        self.n_rows = len(df)
+        if column in df.columns:
+            rows, tokens = tokenize(df[column])
+        else:
+            rows, tokens = np.array([], dtype=np.int64), pd.Series([], dtype=object)
+        codes, vocabulary = pd.factorize(tokens, sort=True)
+
+        # One entry per (word, row), sorted by word then row
+        pairs = np.unique(codes.astype(np.int64) * max(self.n_rows, 1) + rows)
+        words, postings = np.divmod(pairs, max(self.n_rows, 1))
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self.offsets = np.searchsorted(words, np.arange(len(self.vocabulary) + 1))
+        self.postings = postings.astype(np.int32 if self.n_rows < 2**31 else np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        vocabulary = sum(len(word) for word in self.vocabulary) + 8 * len(self.vocabulary)
+        return self.offsets.nbytes + self.postings.nbytes + vocabulary
+
+    def _term_rows(self, term: str) -> np.ndarray:
+        """Sorted rows containing a word that starts with term."""
+        lo = np.searchsorted(self.vocabulary, term, side="left")
+        hi = np.searchsorted(self.vocabulary, term + _MAX_CHAR, side="left")
+        rows = self.postings[self.offsets[lo]:self.offsets[hi]]
+        return rows if hi - lo <= 1 else np.unique(rows)
+
+    def search(self, query: str) -> np.ndarray:
+        """
+        Rows matching every term of a query.
+
+        Each term matches the words it is a prefix of, so "renew" finds
+        "renewable" and "renewables"; case and punctuation are ignored.
+
+        Args:
+            query: Free-text query
+
+        Returns:
+            Sorted array of matching row positions (every row for an empty query)
+        """
+        terms = query_terms(query)
+        if not terms:
+            return np.arange(self.n_rows)
+        matches = sorted((self._term_rows(term) for term in set(terms)), key=len)
+        rows = matches[0]
+        for other in matches[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows.astype(np.int64)
+
+
+def get_text_index(df: pd.DataFrame) -> TextIndex:
+    """Return the post_text index for a loaded frame, building it on first use."""
+    return derived(df, "text_index", TextIndex)
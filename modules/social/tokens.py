@@ -0,0 +1,37 @@
+"""
+Word tokenization of post_text shared by the search index, scorers and deduplication.
+"""
+import re
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Words are runs of letters and digits, compared lowercased
+TOKEN_PATTERN = r"\w+"
+
+
+def query_terms(query: str) -> List[str]:
+    """Search terms of a query, tokenized like the indexed text."""
+    return re.findall(TOKEN_PATTERN, query.lower()) if query else []
+
+
+def tokenize(text: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+    """
+    Split a text column into lowercased word tokens.
+
+    Args:
+        text: Text column of a loaded frame
+
+    Returns:
+        Tuple of (row position of each token, tokens)
+    """
+    tokens = (
+        text.reset_index(drop=True)
+        .astype("string")
+        .str.lower()
+        .str.findall(TOKEN_PATTERN)
+        .explode()
+        .dropna()
+    )
+    return np.asarray(tokens.index, dtype=np.int64), tokens
@@ -2,18 +2,26 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 
+from modules.chart_specs import memoize_chart
+from modules.downsampling import CHART_MAX_POINTS, downsample, downsample_note
+
 def kpi_card(title, value, help_text):
     st.metric(title, value, help=help_text)
 
-def trend_chart(df: pd.DataFrame):
+@memoize_chart
+def trend_chart(df: pd.DataFrame, max_points: int = CHART_MAX_POINTS):
+    """Daily trip counts; series longer than max_points are LTTB-downsampled, noted in the subtitle."""
     daily_trips = df.groupby('pickup_date').size().reset_index(name='trip_count')
+    daily_trips, dropped = downsample(daily_trips, 'pickup_date', 'trip_count', max_points)
+    title = alt.TitleParams('Daily Trip Trend', subtitle=downsample_note(len(daily_trips), dropped)) if dropped else 'Daily Trip Trend'
     chart = alt.Chart(daily_trips).mark_line(point=True).encode(
         x=alt.X('pickup_date:T', title='Date'),
         y=alt.Y('trip_count:Q', title='Number of Trips'),
         tooltip=['pickup_date:T', 'trip_count:Q']
-    ).properties(title='Daily Trip Trend').interactive()
+    ).properties(title=title).interactive()
     return chart
 
+@memoize_chart
 def top_n_chart(df: pd.DataFrame, category: str, n: int = 10):
     top_items = df[category].value_counts().nlargest(n).reset_index()
     top_items.columns = [category, 'count']
@@ -24,6 +32,7 @@ def top_n_chart(df: pd.DataFrame, category: str, n: int = 10):
     ).properties(title=f'Top {n} {category.replace("_", " ").title()}')
     return chart
 
+@memoize_chart
 def timing_heatmap(df: pd.DataFrame):
     heatmap_data = df.groupby(['pickup_weekday', 'pickup_hour']).size().reset_index(name='trip_count')
     weekday_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -35,9 +44,10 @@ def timing_heatmap(df: pd.DataFrame):
     ).properties(title='Trip Heatmap: Weekday vs. Hour')
     return chart
 
+@memoize_chart
 def distribution_chart(df: pd.DataFrame, field: str, title: str, x_title: str):
     """Creates a histogram for a given field."""
-    chart = alt.Chart(df).mark_bar().encode(
+    chart = alt.Chart(df[[field]]).mark_bar().encode(
         x=alt.X(f'{field}:Q', bin=alt.Bin(maxbins=50), title=x_title),
         y=alt.Y('count():Q', title='Number of Trips'),
         tooltip=[alt.Tooltip(f'{field}:Q', bin=alt.Bin(maxbins=50), title=x_title), alt.Tooltip('count():Q', title='Number of Trips')]
@@ -46,6 +56,7 @@ def distribution_chart(df: pd.DataFrame, field: str, title: str, x_title: str):
     ).interactive()
     return chart
 
+@memoize_chart
 def pie_chart(df: pd.DataFrame, category: str, title: str):
     """Creates a pie chart for a given category."""
     data = df[category].value_counts().reset_index()
@@ -1,14 +1,32 @@
-import streamlit as st
+import hashlib
+import os
+import numpy as np
 import pandas as pd
+from modules.caching import DATASETS, BoundedLRUCache, derive_token, stamp_version, version_token
 from modules.transport.data_fetch import ensure_transport_data
 
-@st.cache_data
+ANALYSIS_FOCUSES = ["All Trips", "High-Value Trips", "Peak Hours Only"]
+
+# Row positions of filter results, keyed by their version token and shared by every session
+TRIP_FILTER_CACHE = BoundedLRUCache(max_bytes=int(os.environ.get("TRANSPORT_FILTER_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+
 def load_and_clean_transport_data():
-    """Load, clean, and perform feature engineering on the NYC taxi dataset."""
+    """Load the cleaned NYC taxi dataset, held once per process in the shared dataset registry (read-only)."""
     data_path = ensure_transport_data()
     if data_path is None:
         return pd.DataFrame()
 
+    stat = os.stat(data_path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    version = hashlib.blake2b(repr((os.fspath(data_path), stamp)).encode(), digest_size=16).hexdigest()
+    return DATASETS.get_or_load(
+        ("transport", os.fspath(data_path)),
+        lambda: _clean_transport_data(data_path, version),
+        stamp=stamp,
+    )
+
+def _clean_transport_data(data_path, version=None):
+    """Load, clean, and perform feature engineering on the NYC taxi dataset, tagged with its source version."""
     df = pd.read_csv(data_path)
 
     # Basic cleaning
@@ -43,5 +61,37 @@ def load_and_clean_transport_data():
     # Filter out unreasonable trips
     df = df[(df['trip_duration_mins'] > 0) & (df['trip_duration_mins'] < 120)]
     df = df[df['passengers'] > 0]
-            
-    return df
+
+    return stamp_version(df.reset_index(drop=True), version)
+
+def _select_rows(df, spec, mask):
+    """Rows of df where mask(df) holds, tagged with a token of df's version and spec; positions memoized by token."""
+    parent = version_token(df)
+    token = derive_token(parent, spec) if parent is not None else None
+    positions = TRIP_FILTER_CACHE.get(token) if token is not None else None
+    if positions is None:
+        positions = np.flatnonzero(mask(df))
+        if token is not None:
+            positions.flags.writeable = False
+            TRIP_FILTER_CACHE.put(token, positions)
+    return stamp_version(df.take(positions).reset_index(drop=True), token)
+
+def filter_trips_by_date(df, start_date, end_date):
+    """Trips picked up between start_date and end_date (inclusive)."""
+    def mask(trips):
+        pickup = trips['pickup_datetime'].dt.date
+        return ((pickup >= start_date) & (pickup <= end_date)).to_numpy()
+    return _select_rows(df, {"start_date": str(start_date), "end_date": str(end_date)}, mask)
+
+def apply_analysis_focus(df, focus):
+    """Narrow trips to one of ANALYSIS_FOCUSES (high-value: top quartile of total_amount; peak: 7-9 AM and 5-7 PM)."""
+    if focus == "High-Value Trips":
+        def mask(trips):
+            return (trips['total_amount'] >= trips['total_amount'].quantile(0.75)).to_numpy()
+    elif focus == "Peak Hours Only":
+        def mask(trips):
+            hour = trips['pickup_datetime'].dt.hour
+            return (hour.between(7, 9) | hour.between(17, 19)).to_numpy()
+    else:
+        return df
+    return _select_rows(df, {"focus": focus}, mask)
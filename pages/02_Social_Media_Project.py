@@ -3,11 +3,23 @@ Social Media Project - Complete Analysis (Overview + Advanced Trends)
 """
 import streamlit as st
 import pandas as pd
-from utils import load_data_with_uploader, calculate_kpis, apply_data_filters
+from utils import (
+    ANALYSIS_SCOPES, EXPORT_CACHE, FILTER_RESULT_CACHE, count_above_quantile, export_csv, load_data_with_uploader,
+    select_posts
+)
+from modules.caching import DATASETS, cache_stats
+from modules.social.aggregates import get_aggregates
+from modules.social.derived import DERIVED_CACHE
+from modules.social.creators import top_creators
+from modules.social.keywords import KEYWORD_DIMENSIONS, get_keywords
+from modules.social.sentiment import LEXICON_LABELS_ATTR, sentiment_agreement
+from modules.social.storage import frame_memory_report
 from charts import (
     create_timeseries_chart, create_platform_chart, create_sentiment_chart,
-    create_hashtag_chart, create_topic_chart, create_time_heatmap, create_cta_chart
+    create_hashtag_chart, create_topic_chart, create_time_heatmap, create_cta_chart,
+    create_country_chart
 )
+from modules.chart_specs import CHART_CACHE, render_chart
 
 # Enhanced CSS for complete project
 st.markdown("""
@@ -116,13 +128,9 @@ with st.expander("📖 Project Background & Objectives", expanded=True):
         **Dataset:** The analysis is based on the `sustainability_social_media_posts.csv` dataset, containing over 3,000 posts.
     """)
 
-# Load data with caching
-@st.cache_data(show_spinner=False)
-def load_cached_data():
-    return load_data_with_uploader()
-
+# Load data (held once per process by the shared dataset registry)
 try:
-    df = load_cached_data()
+    df = load_data_with_uploader()
 except Exception as e:
     st.error(f"Error loading data: {e}")
     st.stop()
@@ -196,6 +204,17 @@ with st.sidebar:
         )
     else:
         hashtag_sel = []
+
+    # Full-text search
+    if "post_text" in df.columns:
+        text_query = st.text_input(
+            "🔎 Search Post Text",
+            value="",
+            placeholder="e.g. renewable energy",
+            help="Keep posts containing every word typed; partial words match their beginnings"
+        )
+    else:
+        text_query = ""
     
     # Analysis type
     st.markdown("---")
@@ -203,17 +222,35 @@ with st.sidebar:
     
     analysis_type = st.radio(
         "Choose focus",
-        ["All Content", "High-Engagement Only", "Recent Posts Only"],
+        ANALYSIS_SCOPES,
         help="Adjust analysis scope based on your needs"
     )
 
-# Apply filters
-filtered_df = apply_data_filters(
+    approximate_topk = st.toggle(
+        "⚡ Approximate Top-K",
+        value=False,
+        help="Rank hashtags, topics and CTAs from per-day sketches (faster on large datasets). "
+             "Applies to All Content when only the date range is filtered; turn off to recompute exactly."
+    )
+
+    exact_percentiles = st.toggle(
+        "🎯 Exact Percentiles",
+        value=False,
+        help="Compute the High-Engagement cut and Content Quality Score from every post "
+             "instead of merged quantile sketches."
+    )
+
+# Apply filters and analysis scope (memoized across sessions)
+filtered_df, kpis = select_posts(
     df, 
     platforms=platform_sel,
     sentiments=sentiment_sel,
     date_range=date_range,
-    hashtags=hashtag_sel
+    hashtags=hashtag_sel,
+    scope=analysis_type,
+    approximate=approximate_topk,
+    exact_percentiles=exact_percentiles,
+    search=text_query
 )
 
 # Handle empty data case
@@ -221,17 +258,48 @@ if filtered_df.empty:
     st.warning("No data matches the selected filters. Please try again.")
     st.stop()
 
-# Apply analysis scope
-if analysis_type == "High-Engagement Only" and "engagement_rate" in filtered_df.columns:
-    threshold = filtered_df["engagement_rate"].quantile(0.7)
-    filtered_df = filtered_df[filtered_df["engagement_rate"] >= threshold]
-elif analysis_type == "Recent Posts Only" and "post_date" in filtered_df.columns:
-    recent_date = filtered_df["post_date"].max() - pd.Timedelta(days=30)
-    filtered_df = filtered_df[filtered_df["post_date"] >= recent_date]
+# Every table below comes from one aggregation pass over the selection
+aggregates = get_aggregates(filtered_df)
+
+
+def approximation_note(dim: str, label: str):
+    """Show the error bounds of a sketched top-k table."""
+    bounds = aggregates.approximate.get(dim)
+    if bounds:
+        st.caption(
+            f"≈ Approximate Top-K: post counts may be low by up to {bounds['max_error']:,.0f}; "
+            f"any {label} not listed has at most {bounds['untracked_max']:,.0f} posts. "
+            "Turn off *Approximate Top-K* for exact counts."
+        )
+
 
 # Results summary
 st.success(f"**Showing {len(filtered_df):,} posts** from total {len(df):,} posts")
 
+# Recorded once at ingest, so showing it costs nothing per rerun
+memory = frame_memory_report(df)
+if memory is not None:
+    with st.expander("🧮 Dataset memory footprint"):
+        total = memory.loc["TOTAL"]
+        st.caption(
+            f"Compact schema: {total['bytes_after'] / 2**20:,.1f} MB in memory "
+            f"vs {total['bytes_before'] / 2**20:,.1f} MB as parsed ({total['ratio']:.1f}x smaller)"
+        )
+        st.dataframe(memory, use_container_width=True)
+
+with st.expander("⚙️ Cache statistics"):
+    st.caption("Process-wide caches shared by every session, counted since the server started.")
+    st.dataframe(
+        cache_stats({
+            "Datasets": DATASETS,
+            "Indexes & cubes": DERIVED_CACHE,
+            "Filter results": FILTER_RESULT_CACHE,
+            "Chart specs": CHART_CACHE,
+            "Exports": EXPORT_CACHE,
+        }),
+        use_container_width=True,
+    )
+
 st.markdown("---")
 
 # =============================================================================
@@ -241,8 +309,6 @@ st.markdown("---")
 st.header("Performance Overview")
 
 # KPI Section
-kpis = calculate_kpis(filtered_df)
-
 kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
 
 with kpi_col1:
@@ -278,15 +344,22 @@ with kpi_col3:
 st.subheader("Performance Visualizations")
 
 # Tabs for better organization
-tab1, tab2, tab3 = st.tabs(["Time Trends", "Platform Comparison", "Sentiment Analysis"])
+tab1, tab2, tab3, tab4 = st.tabs(["Time Trends", "Platform Comparison", "Sentiment Analysis", "Geography"])
 
 with tab1:
-    chart = create_timeseries_chart(filtered_df)
+    granularity = st.radio(
+        "Time granularity",
+        options=["auto", "day", "week", "month"],
+        format_func=str.title,
+        horizontal=True,
+        help="Auto picks the finest resolution that keeps the chart to a few hundred points"
+    )
+    chart = create_timeseries_chart(filtered_df, granularity=granularity)
     if chart:
-        st.altair_chart(chart, use_container_width=True)
+        render_chart(chart, use_container_width=True)
         st.markdown("""
         **How to Read This Chart:**
-        - **X-axis**: Days when posts were published
+        - **X-axis**: Days, weeks or months when posts were published
         - **Y-axis**: Total engagement (likes + shares + comments)
         - **Insight**: Look for patterns to optimize posting schedule
         """)
@@ -296,7 +369,7 @@ with tab1:
 with tab2:
     chart = create_platform_chart(filtered_df)
     if chart:
-        st.altair_chart(chart, use_container_width=True)
+        render_chart(chart, use_container_width=True)
         st.markdown("""
         **Platform Analysis Guide:**
         - **Height**: Average engagement rate per platform
@@ -311,15 +384,21 @@ with tab3:
     with sent_col1:
         chart = create_sentiment_chart(filtered_df)
         if chart:
-            st.altair_chart(chart, use_container_width=True)
+            render_chart(chart, use_container_width=True)
         else:
             st.warning("⚠️ No sentiment data available")
 
     with sent_col2:
         st.markdown("#### 💭 Sentiment Distribution")
+        if df.attrs.get(LEXICON_LABELS_ATTR):
+            st.caption("This dataset has no sentiment labels; they are scored from post_text with the word lexicon.")
         
         if "post_sentiment" in filtered_df.columns:
-            sentiment_counts = filtered_df["post_sentiment"].value_counts()
+            sentiment_counts = (
+                aggregates.by("post_sentiment")
+                .set_index("post_sentiment")["posts"]
+                .sort_values(ascending=False, kind="stable")
+            )
             
             for sentiment, count in sentiment_counts.items():
                 percentage = count / len(filtered_df) * 100
@@ -332,6 +411,30 @@ with tab3:
                 </div>
                 """, unsafe_allow_html=True)
 
+        # Re-scored from post_text with the word lexicon (scored once per dataset)
+        agreement = sentiment_agreement(filtered_df)
+        if agreement is not None and agreement.to_numpy().sum() > 0:
+            matched = sum(agreement.loc[label, label] for label in agreement.index)
+            st.metric(
+                "🔤 Lexicon Agreement",
+                f"{matched / agreement.to_numpy().sum():.1%}",
+                help="Share of posts whose post_text lexicon score gives the same label as post_sentiment"
+            )
+            with st.expander("Labels vs lexicon"):
+                st.dataframe(agreement, use_container_width=True)
+
+with tab4:
+    chart = create_country_chart(filtered_df)
+    if chart:
+        render_chart(chart, use_container_width=True)
+        st.markdown("""
+        **Geography Guide:**
+        - **Length**: Number of posts from creators in each country
+        - **Color**: Average engagement rate of those posts
+        """)
+    else:
+        st.warning("⚠️ No location data available")
+
 st.markdown("---")
 
 # =============================================================================
@@ -345,19 +448,21 @@ metrics_col1, metrics_col2, metrics_col3 = st.columns(3)
 
 with metrics_col1:
     if "engagement_rate" in filtered_df.columns and len(filtered_df) > 0:
-        high_quality_posts = len(filtered_df[filtered_df["engagement_rate"] > filtered_df["engagement_rate"].quantile(0.8)])
+        high_quality_posts, rank_error = count_above_quantile(filtered_df, 0.8)
         total_posts = len(filtered_df)
         quality_score = (high_quality_posts / total_posts * 100) if total_posts > 0 else 0
+        error_note = f" (± {rank_error:,} from percentile sketches)" if rank_error else ""
         
         st.metric("🏆 Content Quality Score", f"{quality_score:.1f}%", 
-                 help=f"{high_quality_posts:,} high-quality posts")
+                 help=f"{high_quality_posts:,} high-quality posts{error_note}")
     else:
         st.metric("🏆 Content Quality Score", "N/A")
 
 with metrics_col2:
     if "platform" in filtered_df.columns and len(filtered_df) > 0:
-        platform_count = filtered_df["platform"].nunique()
-        most_used = filtered_df["platform"].mode().iloc[0] if len(filtered_df) > 0 else "N/A"
+        platform_posts = aggregates.by("platform").set_index("platform")["posts"]
+        platform_count = len(platform_posts)
+        most_used = platform_posts.idxmax() if platform_count > 0 else "N/A"
         
         st.metric("Platform Diversity", f"{platform_count} platforms", 
                  help=f"Most used: {most_used}")
@@ -375,11 +480,12 @@ with metrics_col3:
         st.metric("Content Velocity", "N/A")
 
 # Advanced analysis tabs
-adv_tab1, adv_tab2, adv_tab3, adv_tab4 = st.tabs([
+adv_tab1, adv_tab2, adv_tab3, adv_tab4, adv_tab5 = st.tabs([
     "Hashtag Intelligence", 
     "Topic Insights", 
     "Optimal Timing", 
-    "CTA Analysis"
+    "CTA Analysis",
+    "Top Creators"
 ])
 
 with adv_tab1:
@@ -388,7 +494,8 @@ with adv_tab1:
     with hashtag_col1:
         chart = create_hashtag_chart(filtered_df)
         if chart:
-            st.altair_chart(chart, use_container_width=True)
+            render_chart(chart, use_container_width=True)
+            approximation_note("hashtag", "hashtag")
         else:
             st.warning("No hashtag data available in current selection")
     
@@ -397,8 +504,9 @@ with adv_tab1:
         
         if "hashtag" in filtered_df.columns:
             top_hashtags = (
-                filtered_df.groupby("hashtag")
-                .agg(posts=("post_id", "count"), avg_er=("engagement_rate", "mean"))
+                aggregates.by("hashtag")
+                .set_index("hashtag")[["posts", "er"]]
+                .rename(columns={"er": "avg_er"})
                 .sort_values(["posts", "avg_er"], ascending=[False, False])
                 .head(5)
             )
@@ -418,7 +526,8 @@ with adv_tab2:
     with topic_col1:
         chart = create_topic_chart(filtered_df)
         if chart:
-            st.altair_chart(chart, use_container_width=True)
+            render_chart(chart, use_container_width=True)
+            approximation_note("climate_topic", "topic")
         else:
             st.warning("⚠️ No topic data available")
     
@@ -427,8 +536,9 @@ with adv_tab2:
         
         if "climate_topic" in filtered_df.columns:
             top_topics = (
-                filtered_df.groupby("climate_topic")
-                .agg(posts=("post_id", "count"), avg_er=("engagement_rate", "mean"))
+                aggregates.by("climate_topic")
+                .set_index("climate_topic")[["posts", "er"]]
+                .rename(columns={"er": "avg_er"})
                 .sort_values(["posts", "avg_er"], ascending=[False, False])
                 .head(5)
             )
@@ -443,6 +553,28 @@ with adv_tab2:
                 </div>
                 """, unsafe_allow_html=True)
 
+    # Distinctive words per group, re-aggregated from the cached term matrix on every filter change
+    if "post_text" in filtered_df.columns:
+        st.markdown("#### 🔑 Distinctive Keywords")
+        keyword_dims = [dim for dim in KEYWORD_DIMENSIONS if dim in filtered_df.columns]
+        keyword_dim = st.selectbox(
+            "Group keywords by",
+            options=keyword_dims,
+            format_func=lambda dim: {"climate_topic": "Topic", "platform": "Platform", "post_sentiment": "Sentiment"}[dim],
+            help="Words that appear in a group's posts markedly more often than in the rest of the selection"
+        )
+        keywords = get_keywords(filtered_df, keyword_dim)
+        if not keywords.empty:
+            st.dataframe(
+                keywords.groupby(keyword_dim, observed=True, sort=False)["keyword"]
+                .agg(", ".join)
+                .rename("Top keywords")
+                .to_frame(),
+                use_container_width=True
+            )
+        else:
+            st.info("Not enough posts in the current selection to extract keywords")
+
 with adv_tab3:
     time_col1, time_col2 = st.columns([3, 1])
     
@@ -450,7 +582,7 @@ with adv_tab3:
         if "platform" in filtered_df.columns:
             platform_focus = st.selectbox(
                 "Focus Platform for Time Analysis",
-                options=[None] + sorted(filtered_df["platform"].dropna().unique()),
+                options=[None] + sorted(aggregates.by("platform")["platform"]),
                 index=0,
                 format_func=lambda x: "All Platforms" if x is None else f"{x}",
                 help="Select specific platform for detailed timing insights"
@@ -460,7 +592,7 @@ with adv_tab3:
         
         chart = create_time_heatmap(filtered_df, platform_focus)
         if chart:
-            st.altair_chart(chart, use_container_width=True)
+            render_chart(chart, use_container_width=True)
         else:
             st.warning("⚠️ Insufficient time data for heatmap")
     
@@ -483,7 +615,8 @@ with adv_tab3:
 with adv_tab4:
     cta_chart = create_cta_chart(filtered_df)
     if cta_chart:
-        st.altair_chart(cta_chart, use_container_width=True)
+        render_chart(cta_chart, use_container_width=True)
+        approximation_note("call_to_action", "CTA")
         
         st.markdown("""
         **CTA Optimization Guide:**
@@ -493,6 +626,27 @@ with adv_tab4:
     else:
         st.info("💡 **CTA Analysis**: Requires relevant data columns for detailed analysis.")
 
+with adv_tab5:
+    creators = top_creators(filtered_df, n=10)
+    if not creators.empty:
+        st.markdown("#### 👤 Top Creators by Total Engagement")
+        st.dataframe(
+            # Rates are shown as percentages with a printf format, which every supported Streamlit accepts
+            creators.assign(er=creators["er"] * 100).rename(columns={
+                "username": "Creator",
+                "user_id": "User ID",
+                "posts": "Posts",
+                "engagement": "Total Engagement",
+                "er": "Avg ER",
+                "followers": "Followers",
+            }),
+            column_config={"Avg ER": st.column_config.NumberColumn(format="%.2f%%")},
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.info("💡 **Top Creators**: Requires user_id data for creator analysis.")
+
 st.markdown("---")
 
 # =============================================================================
@@ -504,10 +658,10 @@ st.subheader("💾 Export Analysis Results")
 export_col1, export_col2, export_col3 = st.columns(3)
 
 with export_col1:
-    csv_data = filtered_df.to_csv(index=False).encode("utf-8")
+    # Encoded once per filtered view and shared by reruns and sessions
     st.download_button(
         f"📥 Download Complete Data ({len(filtered_df)} rows)",
-        data=csv_data,
+        data=export_csv(filtered_df, "complete", filtered_df.to_frame),
         file_name="social_media_complete_analysis.csv",
         mime="text/csv",
         help="Full filtered dataset with all metrics",
@@ -517,19 +671,22 @@ with export_col1:
 
 with export_col2:
     if "engagement_rate" in filtered_df.columns and "platform" in filtered_df.columns:
-        summary = (
-            filtered_df.groupby("platform")
-            .agg({
-                "engagement_rate": ["mean", "median", "std"],
-                "post_id": "count", 
-                "engagement_total": "sum"
-            })
-            .round(4)
-        )
-        summary_csv = summary.to_csv().encode("utf-8")
+        def platform_summary() -> pd.DataFrame:
+            # Median and std are not additive, so the export reads the rows
+            return (
+                filtered_df[["platform", "engagement_rate", "post_id", "engagement_total"]]
+                .groupby("platform", observed=True)
+                .agg({
+                    "engagement_rate": ["mean", "median", "std"],
+                    "post_id": "count", 
+                    "engagement_total": "sum"
+                })
+                .round(4)
+            )
+
         st.download_button(
-            f"Platform Summary ({len(summary)} platforms)",
-            data=summary_csv,
+            f"Platform Summary ({len(aggregates.by('platform'))} platforms)",
+            data=export_csv(filtered_df, "platform_summary", platform_summary, index=True),
             file_name="platform_performance_summary.csv",
             mime="text/csv",
             help="Aggregated performance metrics by platform",
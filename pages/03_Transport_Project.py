@@ -3,7 +3,11 @@ Transport Project - Complete Analysis (Overview + Timing Analysis)
 """
 import streamlit as st
 import pandas as pd
-from modules.transport.utils import load_and_clean_transport_data
+from modules.caching import DATASETS, cache_stats
+from modules.chart_specs import CHART_CACHE, render_chart
+from modules.transport.utils import (
+    ANALYSIS_FOCUSES, TRIP_FILTER_CACHE, apply_analysis_focus, filter_trips_by_date, load_and_clean_transport_data
+)
 from modules.transport.charts import kpi_card, trend_chart, top_n_chart, distribution_chart, pie_chart, timing_heatmap
 
 st.title("Transport Project")
@@ -54,27 +58,19 @@ with st.sidebar:
     
     analysis_focus = st.radio(
         "Choose analysis focus",
-        ["All Trips", "High-Value Trips", "Peak Hours Only"],
+        ANALYSIS_FOCUSES,
         help="Select the scope of your analysis"
     )
 
-# Apply date filter
-filtered_df = df[(df['pickup_datetime'].dt.date >= start_date) & (df['pickup_datetime'].dt.date <= end_date)]
+# Apply date filter (results carry a version token, so their rows and charts are memoized across reruns)
+filtered_df = filter_trips_by_date(df, start_date, end_date)
 
 if filtered_df.empty:
     st.warning("No data available for the selected date range.")
     st.stop()
 
 # Apply analysis focus
-if analysis_focus == "High-Value Trips":
-    threshold = filtered_df['total_amount'].quantile(0.75)
-    filtered_df = filtered_df[filtered_df['total_amount'] >= threshold]
-elif analysis_focus == "Peak Hours Only":
-    # Define peak hours as 7-9 AM and 5-7 PM
-    filtered_df = filtered_df[
-        (filtered_df['pickup_datetime'].dt.hour.between(7, 9)) |
-        (filtered_df['pickup_datetime'].dt.hour.between(17, 19))
-    ]
+filtered_df = apply_analysis_focus(filtered_df, analysis_focus)
 
 # Results summary
 st.success(f"**Analyzing {len(filtered_df):,} trips** from total {len(df):,} trips")
@@ -121,14 +117,14 @@ with char_tab1:
     dist_cols = st.columns(2)
     
     with dist_cols[0]:
-        st.altair_chart(
+        render_chart(
             distribution_chart(filtered_df, 'trip_distance', 'Trip Distance Distribution', 'Distance (miles)'), 
             use_container_width=True
         )
         st.caption("Distribution of trip distances, showing the frequency of short vs. long trips.")
     
     with dist_cols[1]:
-        st.altair_chart(
+        render_chart(
             distribution_chart(filtered_df, 'trip_duration_mins', 'Trip Duration Distribution', 'Duration (minutes)'), 
             use_container_width=True
         )
@@ -140,14 +136,14 @@ with char_tab2:
     op_cols = st.columns(2)
     
     with op_cols[0]:
-        st.altair_chart(
+        render_chart(
             pie_chart(filtered_df, 'payment_type_name', 'Payment Type Distribution'), 
             use_container_width=True
         )
         st.caption("💳 Breakdown of payment methods used by passengers.")
     
     with op_cols[1]:
-        st.altair_chart(
+        render_chart(
             top_n_chart(filtered_df, 'passengers', n=6), 
             use_container_width=True
         )
@@ -156,10 +152,10 @@ with char_tab2:
 with char_tab3:
     st.subheader("Trends and Popular Routes")
     
-    st.altair_chart(trend_chart(filtered_df), use_container_width=True)
+    render_chart(trend_chart(filtered_df), use_container_width=True)
     st.caption("Daily trip volumes over the selected date range.")
     
-    st.altair_chart(top_n_chart(filtered_df, 'route', 10), use_container_width=True)
+    render_chart(top_n_chart(filtered_df, 'route', 10), use_container_width=True)
     st.caption("Top 10 most frequent trip routes (Pickup ID → Dropoff ID).")
 
 st.markdown("---")
@@ -178,7 +174,7 @@ with timing_tab1:
     # Display the timing heatmap
     heatmap_chart = timing_heatmap(filtered_df)
     if heatmap_chart:
-        st.altair_chart(heatmap_chart, use_container_width=True)
+        render_chart(heatmap_chart, use_container_width=True)
         
         st.markdown("""
         **How to Read This Heatmap:**
@@ -358,3 +354,10 @@ st.success("""
 3. **Route Planning:** Focus on top-performing pickup/dropoff locations
 4. **Performance Tracking:** Monitor KPIs monthly and adjust strategies accordingly
 """)
+
+with st.expander("⚙️ Cache statistics"):
+    st.caption("Process-wide caches shared by every session, counted since the server started.")
+    st.dataframe(
+        cache_stats({"Datasets": DATASETS, "Trip filters": TRIP_FILTER_CACHE, "Chart specs": CHART_CACHE}),
+        use_container_width=True,
+    )
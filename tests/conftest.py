@@ -0,0 +1,33 @@
+"""
+Shared fixtures: the bundled posts CSV, loaded with snapshots kept in a temporary directory.
+"""
+import shutil
+from pathlib import Path
+
+import pytest
+
+from modules.social import storage
+
+SAMPLE_CSV = Path(__file__).parent.parent / "sustainability_social_media_posts.csv"
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    """Point social snapshots at an empty directory."""
+    directory = tmp_path / "snapshots"
+    monkeypatch.setattr(storage, "SNAPSHOT_DIR", directory)
+    return directory
+
+
+@pytest.fixture
+def posts_csv(tmp_path, snapshot_dir):
+    """A private copy of the bundled posts CSV."""
+    path = tmp_path / "posts.csv"
+    shutil.copyfile(SAMPLE_CSV, path)
+    return path
+
+
+@pytest.fixture
+def posts(posts_csv):
+    """The loaded (stamped) posts frame."""
+    return storage.load_posts(str(posts_csv))
@@ -0,0 +1,76 @@
+"""
+Version tokens must only be honoured on the frame they were stamped on.
+"""
+import numpy as np
+import pandas as pd
+
+from modules.caching import stamp_version, version_token
+from utils import apply_data_filters
+
+
+def test_token_belongs_to_the_stamped_object():
+    df = stamp_version(pd.DataFrame({"a": [1, 2, 3]}), "v1")
+    assert version_token(df) == "v1"
+    # attrs are inherited by all of these, the token is not
+    assert version_token(df.copy()) is None
+    assert version_token(df.sort_values("a", ascending=False).reset_index(drop=True)) is None
+    assert version_token(df.assign(b=1)) is None
+    assert version_token(stamp_version(df, None)) is None
+
+
+def test_sorted_copy_does_not_reuse_cached_filter_index(posts):
+    cached = apply_data_filters(posts, platforms=["Facebook"])
+    assert set(cached.to_frame()["platform"].astype(str)) == {"Facebook"}
+
+    reordered = posts.sort_values("engagement_rate").reset_index(drop=True)
+    selection = apply_data_filters(reordered, platforms=["Facebook"])
+    assert set(selection.to_frame()["platform"].astype(str)) == {"Facebook"}
+    assert len(selection.to_frame()) == len(cached.to_frame())
+
+
+def test_edited_copy_does_not_reuse_cached_filter_index(posts):
+    apply_data_filters(posts, platforms=["Facebook"])
+    edited = posts.copy()
+    edited["platform"] = edited["platform"].astype(str).replace({"Facebook": "Instagram"})
+    selection = apply_data_filters(edited, platforms=["Facebook"])
+    assert len(selection.to_frame()) == 0
+    assert np.array_equal(
+        np.sort(apply_data_filters(edited, platforms=["Instagram"]).positions),
+        np.flatnonzero(edited["platform"].to_numpy() == "Instagram"),
+    )
+
+
+def test_waiters_share_one_load_per_key():
+    import threading
+    import time
+
+    from modules.caching import DatasetRegistry
+
+    registry = DatasetRegistry(max_bytes=1 << 20)
+    loads = []
+
+    def slow_load():
+        loads.append(1)
+        time.sleep(0.05)
+        return np.arange(3)
+
+    threads = [threading.Thread(target=registry.get_or_load, args=("k", slow_load)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert registry.stats()["loads"] == 1
+    assert not registry._loading
+
+
+def test_cache_stats_table():
+    from modules.caching import BoundedLRUCache, cache_stats
+
+    cache = BoundedLRUCache(max_bytes=1 << 20)
+    cache.put("a", np.zeros(8))
+    cache.get("a")
+    cache.get("b")
+    table = cache_stats({"cache": cache})
+    assert table.loc["cache", ["hits", "misses", "entries"]].tolist() == [1, 1, 1]
+    assert table.loc["cache", "hit_rate"] == 0.5
@@ -0,0 +1,88 @@
+"""
+LTTB downsampling of line-chart series.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.downsampling import downsample, lttb_indices
+
+
+def reference_lttb(x, y, n_out):
+    """Point-by-point LTTB over the same buckets as lttb_indices."""
+    n = len(x)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = [0]
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        if bucket + 1 < n_out - 2:
+            nxt = slice(edges[bucket + 1], max(edges[bucket + 2], edges[bucket + 1] + 1))
+            next_x, next_y = np.mean(x[nxt]), np.mean(y[nxt])
+        else:
+            next_x, next_y = x[-1], y[-1]
+        ax, ay = x[kept[-1]], y[kept[-1]]
+        best, best_area = lo, -1.0
+        for i in range(lo, hi):
+            area = abs((ax - next_x) * (y[i] - ay) - (ax - x[i]) * (next_y - ay))
+            if area > best_area:
+                best, best_area = i, area
+        kept.append(best)
+    kept.append(n - 1)
+    return np.array(kept)
+
+
+@pytest.mark.parametrize("n, n_out", [(10, 5), (1000, 100), (1001, 37), (5000, 999)])
+def test_matches_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.sort(rng.uniform(0, 100, n))
+    y = rng.normal(size=n).cumsum()
+    kept = lttb_indices(x, y, n_out)
+    np.testing.assert_array_equal(kept, reference_lttb(x, y, n_out))
+    assert len(kept) == n_out
+    assert kept[0] == 0 and kept[-1] == n - 1
+    assert (np.diff(kept) > 0).all()
+
+
+def test_small_budgets_keep_everything():
+    x = np.arange(10.0)
+    np.testing.assert_array_equal(lttb_indices(x, x, 10), np.arange(10))
+    np.testing.assert_array_equal(lttb_indices(x, x, 20), np.arange(10))
+    np.testing.assert_array_equal(lttb_indices(x, x, 2), np.arange(10))
+
+
+def test_peaks_are_kept():
+    y = np.zeros(10_000)
+    y[1234], y[8765] = 50.0, -50.0
+    kept = lttb_indices(np.arange(len(y), dtype=float), y, 100)
+    assert {1234, 8765} <= set(kept.tolist())
+
+
+def test_missing_values_do_not_break_selection():
+    y = np.random.default_rng(1).normal(size=500)
+    y[::7] = np.nan
+    kept = lttb_indices(np.arange(500.0), y, 50)
+    assert len(kept) == 50
+
+
+@pytest.mark.parametrize("make_x", [
+    lambda days: days,
+    lambda days: days.date,
+    lambda days: days.to_numpy().astype("datetime64[D]").astype(object),
+])
+def test_downsample_date_axes(make_x):
+    days = pd.date_range("2020-01-01", periods=1500, freq="D")
+    frame = pd.DataFrame({"day": make_x(days), "value": np.sin(np.arange(1500) / 20)})
+    kept, dropped = downsample(frame, "day", "value", max_points=200)
+    assert len(kept) == 200 and dropped == 1300
+    assert kept["day"].iloc[0] == frame["day"].iloc[0] and kept["day"].iloc[-1] == frame["day"].iloc[-1]
+    assert isinstance(kept["day"].iloc[0], (pd.Timestamp, datetime.date))
+
+
+def test_downsample_within_budget_is_unchanged():
+    frame = pd.DataFrame({"x": range(10), "y": range(10)})
+    kept, dropped = downsample(frame, "x", "y", max_points=10)
+    assert kept is frame and dropped == 0
+    kept, dropped = downsample(frame, "x", "y", max_points=None)
+    assert kept is frame and dropped == 0
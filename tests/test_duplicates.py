@@ -0,0 +1,89 @@
+"""
+Near-duplicate clustering and its persistence beside the snapshot.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.social import duplicates, storage
+from modules.social.derived import DERIVED_CACHE
+from modules.social.duplicates import (
+    DUPLICATE_THRESHOLD,
+    get_duplicate_clusters,
+    near_duplicate_clusters,
+    shingle_jaccard,
+)
+
+BASE = "solar panels on every school roof would cut emissions and teach kids about clean energy every day"
+
+
+def test_exact_and_near_duplicates_cluster():
+    texts = pd.Series([
+        BASE,
+        "completely unrelated words about ocean plastic cleanup and volunteer beach days",
+        BASE,
+        BASE + " now",
+        None,
+        "",
+    ])
+    clusters = near_duplicate_clusters(pd.DataFrame({"post_text": texts}))
+    assert clusters.tolist()[:4] == [0, 1, 0, 0]
+    # Missing and empty texts are their own clusters
+    assert clusters[4] == 4 and clusters[5] == 5
+
+
+def test_members_are_near_duplicates_of_their_representative():
+    rng = np.random.default_rng(0)
+    words = np.array([f"w{i}" for i in range(40)])
+    base = rng.choice(words, 30)
+    texts = []
+    for _ in range(300):
+        # Copies of one text with a growing number of replaced words
+        copy = base.copy()
+        swap = rng.integers(0, len(copy), rng.integers(0, 12))
+        copy[swap] = rng.choice(words, len(swap))
+        texts.append(" ".join(copy))
+    texts = pd.Series(texts)
+    clusters = near_duplicate_clusters(pd.DataFrame({"post_text": texts}))
+    members = np.flatnonzero(clusters != np.arange(len(texts)))
+    assert len(members)
+    similarity = shingle_jaccard(texts, members, clusters[members])
+    assert (similarity >= DUPLICATE_THRESHOLD).all()
+
+
+def test_shingle_jaccard_matches_sets():
+    texts = pd.Series(["a b c d e", "a b c d f", "x y z"])
+    similarity = shingle_jaccard(texts, np.array([0, 0, 2]), np.array([1, 2, 2]))
+    # Shingles run past the end of a post: {abc, bcd, cde, de_, e__} vs {abc, bcd, cdf, df_, f__}
+    assert similarity.tolist() == pytest.approx([2 / 8, 0.0, 1.0])
+
+
+def test_clusters_are_saved_with_the_snapshot(posts, posts_csv, snapshot_dir, monkeypatch):
+    DERIVED_CACHE.clear()
+    clusters = get_duplicate_clusters(posts)
+    saved = list(snapshot_dir.glob("*.clusters.npy"))
+    assert len(saved) == 1
+
+    # A later process loads the ids instead of clustering again
+    DERIVED_CACHE.clear()
+    monkeypatch.setattr(duplicates, "near_duplicate_clusters", pytest.fail)
+    reloaded = storage.load_posts(str(posts_csv))
+    assert np.array_equal(get_duplicate_clusters(reloaded), clusters)
+
+
+def test_copies_do_not_read_or_write_saved_clusters(posts, snapshot_dir):
+    DERIVED_CACHE.clear()
+    get_duplicate_clusters(posts.copy())
+    assert not list(snapshot_dir.glob("*.clusters.npy"))
+
+
+def test_saved_clusters_are_dropped_when_the_source_changes(posts, posts_csv, snapshot_dir):
+    DERIVED_CACHE.clear()
+    get_duplicate_clusters(posts)
+    with open(posts_csv, "rb") as fh:
+        fh.readline()
+        first = fh.readline()
+    with open(posts_csv, "ab") as fh:
+        fh.write(first)
+    storage.load_posts(str(posts_csv))
+    assert not list(snapshot_dir.glob("*.clusters.npy"))
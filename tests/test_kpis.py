@@ -0,0 +1,18 @@
+"""
+KPI cards: the ingest-time accumulator only answers for the loaded frame itself.
+"""
+import pytest
+
+from modules.social.accumulators import KPIAccumulator
+from utils import calculate_kpis
+
+
+def test_loaded_frame_uses_ingest_accumulator(posts):
+    assert calculate_kpis(posts) == pytest.approx(KPIAccumulator().update(posts).kpis())
+
+
+def test_edited_copy_is_recomputed(posts):
+    edited = posts.copy()
+    edited["engagement_rate"] = edited["engagement_rate"] * 100
+    kpis = calculate_kpis(edited)
+    assert kpis["avg_engagement_rate"] == pytest.approx(calculate_kpis(posts)["avg_engagement_rate"] * 100)
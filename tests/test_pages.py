@@ -0,0 +1,56 @@
+"""
+Smoke tests running each page script headless with Streamlit's AppTest.
+"""
+from pathlib import Path
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from modules.transport.data_fetch import DATA_CSV
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture(autouse=True)
+def repo_cwd(monkeypatch, snapshot_dir):
+    # Pages find the bundled CSV relative to the working directory
+    monkeypatch.chdir(ROOT)
+
+
+def run_page(name: str) -> AppTest:
+    app = AppTest.from_file(str(ROOT / name), default_timeout=120)
+    app.run()
+    assert not app.exception, [e.message for e in app.exception]
+    return app
+
+
+@pytest.mark.parametrize("name", ["Home.py", "app_minimal.py", "pages/01_Game_Manager.py"])
+def test_static_pages(name):
+    run_page(name)
+
+
+@pytest.mark.skipif(not DATA_CSV.exists(), reason="taxi data is downloaded on first use")
+def test_transport_page():
+    run_page("pages/03_Transport_Project.py")
+
+
+def test_social_media_page():
+    app = run_page("pages/02_Social_Media_Project.py")
+    assert app.metric
+    assert len(app.get("download_button")) == 2
+
+
+@pytest.mark.parametrize("scope", ["High-Engagement Only", "Recent Posts Only", "Collapse Duplicates"])
+def test_social_media_page_scopes(scope):
+    app = run_page("pages/02_Social_Media_Project.py")
+    focus = next(radio for radio in app.radio if scope in radio.options)
+    focus.set_value(scope).run()
+    assert not app.exception, [e.message for e in app.exception]
+    assert len(app.get("download_button")) == 2
+
+
+@pytest.mark.parametrize("label", ["⚡ Approximate Top-K", "🎯 Exact Percentiles"])
+def test_social_media_page_toggles(label):
+    app = run_page("pages/02_Social_Media_Project.py")
+    next(toggle for toggle in app.toggle if toggle.label == label).set_value(True).run()
+    assert not app.exception, [e.message for e in app.exception]
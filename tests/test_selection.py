@@ -0,0 +1,23 @@
+"""
+Exports keep the schema of the source CSV plus the engagement metrics.
+"""
+import pandas as pd
+
+from modules.social.selection import PostSelection
+from utils import apply_data_filters
+
+
+def test_export_schema(posts, posts_csv):
+    source = pd.read_csv(posts_csv)
+    expected = [*source.columns, "engagement_total", "engagement_rate", "post_month"]
+    for selection in (PostSelection(posts), apply_data_filters(posts, platforms=["Facebook"])):
+        frame = selection.to_frame()
+        assert list(frame.columns) == expected
+        assert len(frame) == len(selection)
+
+
+def test_export_restores_source_values(posts, posts_csv):
+    source = pd.read_csv(posts_csv)
+    frame = PostSelection(posts).to_frame()
+    assert frame["user_id"].astype(str).tolist() == source["user_id"].astype(str).tolist()
+    assert frame["post_id"].tolist() == source["post_id"].tolist()
@@ -0,0 +1,13 @@
+"""
+Lexicon scoring gives the same scores in-process and across a process pool.
+"""
+import numpy as np
+
+from modules.social.sentiment import score_texts
+
+
+def test_pool_matches_in_process(posts):
+    texts = posts["post_text"].to_numpy(dtype=object, na_value=None)
+    serial = score_texts(texts, workers=1)
+    pooled = score_texts(texts, workers=2, chunksize=len(texts) // 3 + 1)
+    np.testing.assert_array_equal(pooled, serial)
@@ -0,0 +1,25 @@
+"""
+Approximate top-k tables have the schema of exact ones and agree with them where exact.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.social.aggregates import get_aggregates
+from utils import select_posts
+
+
+@pytest.mark.parametrize("date_range", [None, (pd.Timestamp("2024-03-01"), pd.Timestamp("2024-09-30"))])
+def test_approximate_tables_match_exact(posts, date_range):
+    exact, _ = select_posts(posts, date_range=date_range)
+    approximate, _ = select_posts(posts, date_range=date_range, approximate=True)
+    assert approximate.aggregates.approximate
+    for dim in approximate.aggregates.approximate:
+        table = approximate.aggregates.by(dim)
+        reference = get_aggregates(exact).by(dim)
+        assert list(table.columns) == [*reference.columns, "error"]
+        # Values counted without error carry exact measures
+        merged = table[table["error"] == 0].merge(reference, on=dim, suffixes=("", "_exact"))
+        assert len(merged)
+        for col in reference.columns.drop(dim):
+            np.testing.assert_allclose(merged[col].to_numpy(dtype=float), merged[f"{col}_exact"].to_numpy(dtype=float))
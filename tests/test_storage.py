@@ -0,0 +1,121 @@
+"""
+Snapshots: an incrementally appended load must equal a full reparse of the same file.
+"""
+import json
+
+import pandas as pd
+import pytest
+
+from modules.social import storage
+from modules.social.accumulators import KPI_ATTR, KPIAccumulator
+
+
+def comparable(df: pd.DataFrame) -> pd.DataFrame:
+    """Categories of appended parts are unioned in another order, so compare values."""
+    return df.apply(lambda col: col.astype(object) if isinstance(col.dtype, pd.CategoricalDtype) else col)
+
+
+def assert_matches_full_parse(df: pd.DataFrame, path) -> None:
+    full = storage.read_posts_csv(str(path))
+    pd.testing.assert_frame_equal(comparable(df), comparable(full))
+    assert df.attrs[KPI_ATTR] == pytest.approx(KPIAccumulator().update(full).to_dict())
+
+
+def split_rows(path):
+    """Header line and data lines of a CSV, each with its line ending."""
+    with open(path, "rb") as fh:
+        lines = fh.readlines()
+    return lines[0], lines[1:]
+
+
+def manifest(path) -> dict:
+    return json.loads(storage._manifest_path(str(path)).read_text())
+
+
+def write(path, header, rows, trailing_newline=True):
+    data = header + b"".join(rows)
+    path.write_bytes(data if trailing_newline else data.rstrip(b"\n"))
+
+
+@pytest.fixture
+def halves(posts_csv):
+    """Writes the first half of the posts and returns (header, first half, second half)."""
+    header, rows = split_rows(posts_csv)
+    middle = len(rows) // 2
+    write(posts_csv, header, rows[:middle])
+    return header, rows[:middle], rows[middle:]
+
+
+def test_unchanged_file_is_served_from_the_snapshot(posts_csv, monkeypatch):
+    first = storage.load_posts(str(posts_csv))
+    monkeypatch.setattr(storage, "read_posts_csv", pytest.fail)
+    second = storage.load_posts(str(posts_csv))
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_appended_rows_are_parsed_as_a_new_part(posts_csv, halves):
+    header, head, tail = halves
+    storage.load_posts(str(posts_csv))
+    write(posts_csv, header, head + tail)
+    df = storage.load_posts(str(posts_csv))
+    assert len(manifest(posts_csv)["parts"]) == 2
+    assert_matches_full_parse(df, posts_csv)
+
+
+def test_edited_prefix_triggers_a_full_rebuild(posts_csv, halves):
+    header, head, tail = halves
+    storage.load_posts(str(posts_csv))
+    edited = [head[0].replace(b"Facebook", b"LinkedIn", 1), *head[1:]]
+    assert edited[0] != head[0]
+    write(posts_csv, header, edited + tail)
+    df = storage.load_posts(str(posts_csv))
+    assert len(manifest(posts_csv)["parts"]) == 1
+    assert_matches_full_parse(df, posts_csv)
+
+
+def test_missing_trailing_newline_triggers_a_full_rebuild(posts_csv, halves):
+    header, head, tail = halves
+    write(posts_csv, header, head, trailing_newline=False)
+    storage.load_posts(str(posts_csv))
+    assert not manifest(posts_csv)["ends_with_newline"]
+    # The appended rows continue the unterminated last line
+    write(posts_csv, header, head + tail)
+    df = storage.load_posts(str(posts_csv))
+    assert len(manifest(posts_csv)["parts"]) == 1
+    assert len(df) == len(head) + len(tail)
+    assert_matches_full_parse(df, posts_csv)
+
+
+def test_shrunk_file_triggers_a_full_rebuild(posts_csv, halves):
+    header, head, _ = halves
+    storage.load_posts(str(posts_csv))
+    write(posts_csv, header, head[:-5])
+    df = storage.load_posts(str(posts_csv))
+    assert len(df) == len(head) - 5
+    assert len(manifest(posts_csv)["parts"]) == 1
+    assert_matches_full_parse(df, posts_csv)
+
+
+def test_empty_append_keeps_the_parts(posts_csv, halves):
+    header, head, _ = halves
+    storage.load_posts(str(posts_csv))
+    write(posts_csv, header, head + [b"\n"])
+    df = storage.load_posts(str(posts_csv))
+    assert len(manifest(posts_csv)["parts"]) == 1
+    assert len(df) == len(head)
+
+
+def test_parts_are_compacted_past_the_limit(posts_csv, snapshot_dir, monkeypatch):
+    monkeypatch.setattr(storage, "MAX_SNAPSHOT_PARTS", 3)
+    header, rows = split_rows(posts_csv)
+    step = len(rows) // 5
+    counts = []
+    for end in range(step, 5 * step + 1, step):
+        write(posts_csv, header, rows[:end])
+        df = storage.load_posts(str(posts_csv))
+        counts.append(len(manifest(posts_csv)["parts"]))
+        assert len(df) == end
+    # The fourth part is folded into one; appends then resume from it
+    assert counts == [1, 2, 3, 1, 2]
+    assert sorted(path.name for path in snapshot_dir.glob("*.parquet")) == sorted(manifest(posts_csv)["parts"])
+    assert_matches_full_parse(df, posts_csv)
@@ -1,69 +1,64 @@
 """
 Utilities for data processing and loading.
 """
+import hashlib
+import json
 import os
-from typing import Optional
-import pandas as pd
+from typing import Callable, Optional, Tuple
 import numpy as np
+import pandas as pd
 import streamlit as st
+from modules.caching import DATASETS, BoundedLRUCache, derive_token, version_token
+from modules.social.accumulators import KPIAccumulator, frame_accumulator
+from modules.social.aggregates import get_aggregates
+from modules.social.cube import get_cube
+from modules.social.duplicates import get_duplicate_clusters
+from modules.social.filter_index import get_filter_index, keeps_all
+from modules.social.quantiles import QuantileSummary, get_quantile_sketches
+from modules.social.selection import PostSelection
+from modules.social.sketches import approximate_aggregates
+from modules.social.storage import load_posts, spool_upload
+from modules.social.text_index import get_text_index
+from modules.social.tokens import query_terms
+
+ANALYSIS_SCOPES = ["All Content", "High-Engagement Only", "Recent Posts Only", "Collapse Duplicates"]
+
+# Filter results (row positions + KPIs) shared by every session in the process
+FILTER_RESULT_CACHE = BoundedLRUCache(max_bytes=int(os.environ.get("FILTER_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+
+# CSV bytes of exported views, keyed by the view's version token
+EXPORT_CACHE = BoundedLRUCache(max_bytes=int(os.environ.get("EXPORT_CACHE_MAX_BYTES", 128 * 1024 * 1024)))
 
 
-@st.cache_data(show_spinner=False)
-def load_data(csv_path: str) -> pd.DataFrame:
+def load_data(csv_path: str, progress: Optional[Callable[[float], None]] = None) -> pd.DataFrame:
     """
     Load and preprocess social media data from CSV.
     
+    File paths are served from a Parquet snapshot keyed on the file's size,
+    mtime and content hash, so restarts skip the CSV parse until the file changes.
+    When the file has only been appended to, just the new rows are parsed.
+    Loaded frames are held once per process in the shared DATASETS registry.
+    Uploaded file objects are first spooled to disk under their content hash,
+    so they take the same snapshot path and identical uploads share one entry.
+    
     Args:
-        csv_path: Path to the CSV file
+        csv_path: Path to the CSV file (or an uploaded file object)
+        progress: Optional callback receiving the fraction of bytes parsed, when parsing
         
     Returns:
-        Processed DataFrame with engagement metrics and normalized columns
+        Processed DataFrame with engagement metrics and normalized columns.
+        It is shared by every session and read-only: copy before modifying.
     """
-    df = pd.read_csv(
-        csv_path,
-        parse_dates=["post_date"],
-        encoding="utf-8"
-    )
-    
-    # Normalize numeric columns
-    numeric_cols = [
-        "engagement_likes",
-        "engagement_shares", 
-        "engagement_comments",
-        "user_followers",
-    ]
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    # Create engagement metrics
-    df["engagement_total"] = (
-        df.get("engagement_likes", 0).fillna(0)
-        + df.get("engagement_shares", 0).fillna(0)
-        + df.get("engagement_comments", 0).fillna(0)
-    )
-    df["engagement_rate"] = np.where(
-        df.get("user_followers", 0).fillna(0) > 0,
-        df["engagement_total"] / df["user_followers"],
-        np.nan,
+    if not isinstance(csv_path, (str, os.PathLike)):
+        csv_path = spool_upload(csv_path)
+    path = os.fspath(csv_path)
+    stat = os.stat(path)
+    return DATASETS.get_or_load(
+        ("social", path),
+        lambda: load_posts(path, progress=progress),
+        stamp=(stat.st_size, stat.st_mtime_ns),
     )
 
-    # Create normalized date fields
-    if "post_date" in df.columns:
-        df["post_date"] = pd.to_datetime(df["post_date"], errors="coerce")
-        df["post_month"] = df["post_date"].dt.to_period("M").dt.to_timestamp()
-
-    # Normalize hashtag (remove nulls, lowercase)
-    if "hashtag" in df.columns:
-        df["hashtag"] = df["hashtag"].astype(str).str.strip().str.lower()
-
-    # Normalize categorical columns
-    for c in ["post_sentiment", "climate_topic", "platform"]:
-        if c in df.columns:
-            df[c] = df[c].astype(str)
-
-    return df
-
 
 def get_default_csv_path() -> str:
     """Get the default CSV path, preferring relative path for deployment."""
@@ -104,7 +99,17 @@ def load_data_with_uploader(default_path: Optional[str] = None) -> pd.DataFrame:
     
     if uploaded_file is not None:
         try:
-            return load_data(uploaded_file)
+            # Spool once per upload and session; reruns reuse the spooled file
+            spool_key = f"_spooled_upload_{uploaded_file.file_id}"
+            if spool_key not in st.session_state:
+                st.session_state[spool_key] = spool_upload(uploaded_file)
+            bar = st.progress(0.0, text="Đang xử lý file upload...")
+            df = load_data(
+                st.session_state[spool_key],
+                progress=lambda done: bar.progress(done, text=f"Đang xử lý file upload... {done:.0%}"),
+            )
+            bar.empty()
+            return df
         except Exception as e:
             st.error(f"Lỗi khi đọc file upload: {e}")
             st.stop()
@@ -117,55 +122,259 @@ def calculate_kpis(df: pd.DataFrame) -> dict:
     """
     Calculate key performance indicators from the dataset.
     
+    Selections are answered from their AggregateBundle totals (the summed
+    per-cell accumulators), and the loaded frame itself from the accumulator
+    recorded while it was ingested; other frames, including copies of the
+    loaded frame, are accumulated in one pass.
+    
     Args:
-        df: Input DataFrame
+        df: Input DataFrame or PostSelection
         
     Returns:
         Dictionary with KPI values
     """
-    total_posts = int(len(df))
-    avg_eng_rate = float(df["engagement_rate"].mean(skipna=True)) if "engagement_rate" in df else float("nan")
-    total_eng = int(df["engagement_total"].sum()) if "engagement_total" in df else 0
-    
-    return {
-        "total_posts": total_posts,
-        "avg_engagement_rate": avg_eng_rate,
-        "total_engagement": total_eng
-    }
+    if isinstance(df, PostSelection):
+        return KPIAccumulator.from_totals(get_aggregates(df).totals).kpis()
+    accumulator = frame_accumulator(df)
+    if accumulator is not None:
+        return accumulator.kpis()
+    return KPIAccumulator().update(df).kpis()
 
 
 def apply_data_filters(df: pd.DataFrame, 
                       platforms: list = None,
                       sentiments: list = None, 
                       date_range: tuple = None,
-                      hashtags: list = None) -> pd.DataFrame:
+                      hashtags: list = None,
+                      search: str = None) -> PostSelection:
     """
     Apply filters to the dataset.
     
+    Filters are resolved against the frame's precomputed inverted index
+    (row positions grouped by value and a sorted date array) rather than by scanning,
+    and the result references the input frame instead of copying it. A text
+    search is answered by the post_text word index and intersected with them.
+    
     Args:
         df: Input DataFrame
         platforms: List of platforms to filter
         sentiments: List of sentiments to filter
         date_range: Tuple of (start_date, end_date)
         hashtags: List of hashtags to filter
+        search: Words every post_text must contain (prefixes match)
         
     Returns:
-        Filtered DataFrame
+        PostSelection over the matching rows of df
     """
-    filtered = df.copy()
+    positions = get_filter_index(df).select(
+        platforms=platforms,
+        sentiments=sentiments,
+        date_range=date_range,
+        hashtags=hashtags,
+    )
+    if query_terms(search):
+        positions = np.intersect1d(positions, get_text_index(df).search(search), assume_unique=True)
+    return PostSelection(df, positions)
+
+
+def apply_analysis_scope(df, scope: str = ANALYSIS_SCOPES[0], threshold: Optional[float] = None):
+    """
+    Narrow a filtered dataset to one of the ANALYSIS_SCOPES.
     
-    if platforms and "platform" in filtered.columns:
-        filtered = filtered[filtered["platform"].isin(platforms)]
+    Args:
+        df: Filtered DataFrame or PostSelection
+        scope: "All Content", "High-Engagement Only" (top 30% ER), "Recent Posts Only" (last 30 days)
+            or "Collapse Duplicates" (first post of each near-duplicate cluster)
+        threshold: Precomputed High-Engagement cut (e.g. from a quantile sketch);
+            the exact 0.7 quantile of df when None
         
-    if sentiments and "post_sentiment" in filtered.columns:
-        filtered = filtered[filtered["post_sentiment"].isin(sentiments)]
+    Returns:
+        The narrowed dataset, of the same type as df
+    """
+    if scope == "High-Engagement Only" and "engagement_rate" in df.columns:
+        if threshold is None:
+            threshold = df["engagement_rate"].quantile(0.7)
+        return df[df["engagement_rate"] >= threshold]
+    if scope == "Recent Posts Only" and "post_date" in df.columns:
+        recent_date = df["post_date"].max() - pd.Timedelta(days=30)
+        return df[df["post_date"] >= recent_date]
+    if scope == "Collapse Duplicates" and "post_text" in df.columns:
+        # Clustered once per dataset, the first time any session collapses duplicates
+        clusters = get_duplicate_clusters(getattr(df, "base", df))
+        positions = getattr(df, "positions", None)
+        if positions is not None:
+            clusters = clusters[positions]
+        return df[~pd.Series(clusters).duplicated().to_numpy()]
+    return df
+
+
+def count_above_quantile(df, q: float) -> Tuple[int, int]:
+    """
+    Count posts whose engagement rate is above the q-quantile of the selection.
+    
+    Answered from the selection's quantile sketch summary when it has one.
+    
+    Args:
+        df: DataFrame or PostSelection
+        q: Quantile in [0, 1]
         
-    if date_range and "post_date" in filtered.columns:
-        start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-        mask = (filtered["post_date"] >= start) & (filtered["post_date"] <= end)
-        filtered = filtered[mask]
+    Returns:
+        Tuple of (post count, most posts the count can be off by)
+    """
+    summary = getattr(df, "er_summary", None)
+    if summary is not None:
+        return summary.count_above(summary.quantile(q)), summary.rank_error
+    rate = df["engagement_rate"]
+    return int((rate > rate.quantile(q)).sum()), 0
+
+
+def _scoped_summary(summary: Optional[QuantileSummary], scope: str, threshold: Optional[float]) -> Optional[QuantileSummary]:
+    """Quantile summary of the posts an analysis scope keeps, when it can be derived."""
+    if summary is None or scope == ANALYSIS_SCOPES[0]:
+        return summary
+    if scope == ANALYSIS_SCOPES[1] and threshold is not None:
+        return summary.at_least(threshold)
+    return None
+
+
+def filter_fingerprint(platforms: list = None,
+                       sentiments: list = None,
+                       date_range: tuple = None,
+                       hashtags: list = None,
+                       scope: str = ANALYSIS_SCOPES[0],
+                       search: str = None) -> str:
+    """Canonical digest of a filter spec; the order of selected values does not matter."""
+    def canonical(values):
+        return sorted(str(v) for v in values) if values else None
+
+    spec = {
+        "platforms": canonical(platforms),
+        "sentiments": canonical(sentiments),
+        "date_range": [pd.Timestamp(bound).isoformat() for bound in date_range] if date_range else None,
+        "hashtags": canonical(hashtags),
+        "scope": scope,
+        "search": sorted(set(query_terms(search))) or None,
+    }
+    return hashlib.blake2b(json.dumps(spec, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def select_posts(df: pd.DataFrame,
+                 platforms: list = None,
+                 sentiments: list = None,
+                 date_range: tuple = None,
+                 hashtags: list = None,
+                 scope: str = ANALYSIS_SCOPES[0],
+                 approximate: bool = False,
+                 exact_percentiles: bool = False,
+                 search: str = None) -> Tuple[PostSelection, dict]:
+    """
+    Apply filters and analysis scope and compute KPIs, memoized across sessions.
+    
+    Results are kept in FILTER_RESULT_CACHE keyed by a version token derived
+    from the dataset version and the canonical filter fingerprint, so a popular
+    view is computed once per process rather than once per session. The
+    selection's AggregateBundle is cached with the KPIs, so charts and cards on
+    a hit need no pass over rows, and the selection carries the token for the
+    caches downstream (e.g. memoized chart specs).
+    
+    Args:
+        df: Loaded DataFrame
+        platforms: List of platforms to filter
+        sentiments: List of sentiments to filter
+        date_range: Tuple of (start_date, end_date)
+        hashtags: List of hashtags to filter
+        scope: One of ANALYSIS_SCOPES
+        approximate: Answer the hashtag, topic and CTA tables from the per-day
+            heavy-hitter sketches. Only applied to unscoped views filtered by date
+            alone; the bundle's ``approximate`` attribute says whether it was.
+        exact_percentiles: Compute engagement-rate percentiles from the rows
+            instead of the day x platform x sentiment quantile sketches
+        search: Words every post_text must contain (prefixes match)
         
-    if hashtags and "hashtag" in filtered.columns:
-        filtered = filtered[filtered["hashtag"].isin(hashtags)]
+    Returns:
+        Tuple of (PostSelection over the matching rows, KPI dictionary)
+    """
+    version = version_token(df)
+    # Text matches are row-level, so searched views never come from cube cells or sketches
+    searching = bool(query_terms(search))
+    cube = None
+    if version is not None and scope == ANALYSIS_SCOPES[0] and not searching:
+        # Scopes cut on row-level statistics, so only unscoped views come from the cube
+        cube = get_cube(df).view(
+            platforms=platforms, sentiments=sentiments, date_range=date_range, hashtags=hashtags, frame=df
+        )
+
+    if approximate:
+        # Sketches are partitioned by day only (partly covered days are counted from their rows)
+        approximate = cube is not None and all(
+            keeps_all(df, col, values)
+            for col, values in (("platform", platforms), ("post_sentiment", sentiments), ("hashtag", hashtags))
+        )
+
+    summary = None
+    if not (exact_percentiles or searching) and version is not None and keeps_all(df, "hashtag", hashtags):
+        # Hashtags are not a sketch partition, so a hashtag filter needs exact percentiles
+        summary = get_quantile_sketches(df).summary(
+            platforms=platforms, sentiments=sentiments, date_range=date_range, frame=df
+        )
+    threshold = summary.quantile(0.7) if summary is not None and scope == ANALYSIS_SCOPES[1] else None
+
+    key = None
+    if version is not None:
+        key = derive_token(version, (
+            filter_fingerprint(platforms, sentiments, date_range, hashtags, scope, search),
+            approximate,
+            summary is None,
+        ))
+        cached = FILTER_RESULT_CACHE.get(key)
+        if cached is not None:
+            positions, kpis, aggregates = cached
+            selection = PostSelection(df, positions, cube=cube)
+            selection.aggregates = aggregates
+            selection.er_summary = _scoped_summary(summary, scope, threshold)
+            selection.version_token = key
+            return selection, dict(kpis)
+
+    selection = apply_analysis_scope(
+        apply_data_filters(
+            df, platforms=platforms, sentiments=sentiments, date_range=date_range, hashtags=hashtags, search=search
+        ),
+        scope,
+        threshold=threshold,
+    )
+    selection.cube = cube
+    selection.er_summary = _scoped_summary(summary, scope, threshold)
+    selection.version_token = key
+    if approximate:
+        selection.aggregates = approximate_aggregates(selection, date_range)
+    kpis = calculate_kpis(selection)
+    if key is not None:
+        if selection.positions is not None:
+            selection.positions.flags.writeable = False
+        FILTER_RESULT_CACHE.put(key, (selection.positions, dict(kpis), get_aggregates(selection)))
+    return selection, kpis
+
+
+def export_csv(selection: PostSelection, kind: str, build: Callable[[], pd.DataFrame], index: bool = False) -> bytes:
+    """
+    CSV bytes of a table built from a selection, memoized per select_posts view.
     
-    return filtered
+    Download buttons need their bytes on every rerun, so a view's exports are
+    encoded once per process rather than on each rerun of each session.
+    
+    Args:
+        selection: Selection the table is built from
+        kind: Name of the export, part of the cache key
+        build: Function building the table
+        index: Whether to write the table's index
+        
+    Returns:
+        UTF-8 encoded CSV
+    """
+    def encode():
+        return build().to_csv(index=index).encode("utf-8")
+
+    token = getattr(selection, "version_token", None)
+    if token is None:
+        return encode()
+    return EXPORT_CACHE.get_or_compute((kind, token), encode)